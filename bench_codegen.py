@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark of specialized (code-generated) Huffman decoders against the
+generic HuffmanTable.find_next_symbol(), by block size. Every input is a
+single Huffman block, dynamic except for the smallest sizes, up to about
+200 symbols, for which zlib picks the fixed codes. The specialized run
+includes generating its decoders, so small blocks show the cost of
+generation and large blocks its payoff. The break-even point is what
+CODEGEN_THRESHOLD should be set to; by default, the decoder compares it
+with an estimate of the block's size made before decoding the block, see
+pyflate.block_estimate().
+
+Usage: python bench_codegen.py [symbols...]
+"""
+
+import io
+import random
+import sys
+import time
+import typing as T
+import zlib
+
+from pyflate import gzip_main
+from pyflate.huffman import CODEGEN_THRESHOLD, _specialized
+from pyflate.log import null_tracer
+
+SIZES = [25, 50, 100, 200, 400, 800, 1600, 6400]
+
+
+def sample(symbols: int, seed: int = 0) -> bytes:
+    """Return a gzip member of one dynamic block of about symbols symbols."""
+    rng = random.Random(seed)
+    # skewed over all byte values, like text or binary data
+    data = bytes(min(int(rng.expovariate(0.03)), 255) for _ in range(symbols))
+    c = zlib.compressobj(9, zlib.DEFLATED, 31, strategy=zlib.Z_HUFFMAN_ONLY)
+    return c.compress(data) + c.flush()
+
+
+def best_of(fn: T.Callable[[], T.Any], repeat: int = 9) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _main(sizes: T.List[int]) -> None:
+    print(f"CODEGEN_THRESHOLD = {CODEGEN_THRESHOLD}")
+    print(
+        f"{'symbols':>8} {'generic':>10} {'specialized':>12} {'speedup':>8}"
+        f" {'auto':>10}"
+    )
+    for symbols in sizes:
+        payload = sample(symbols)
+
+        def generic() -> None:
+            gzip_main(io.BytesIO(payload), tracer=null_tracer, codegen=False)
+
+        def specialized() -> None:
+            _specialized.clear()
+            gzip_main(io.BytesIO(payload), tracer=null_tracer, codegen=True)
+
+        def auto() -> None:
+            _specialized.clear()
+            gzip_main(io.BytesIO(payload), tracer=null_tracer)
+
+        g, s, a = best_of(generic), best_of(specialized), best_of(auto)
+        print(
+            f"{symbols:8} {g * 1e3:8.2f}ms {s * 1e3:10.2f}ms {g / s:7.2f}x"
+            f" {a * 1e3:8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    _main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark for the decoder and the command line interface, based
+on python -X importtime. Every measurement runs in a fresh interpreter and
+the best of several runs is kept, to filter out noise.
+
+Modules on the import path of the CLI do not import typing at run time:
+their annotations are postponed (from __future__ import annotations) and
+typing is imported in an "if TYPE_CHECKING:" block, with TYPE_CHECKING set
+to False in the module itself, so that only type checkers follow it.
+
+Usage: python bench_import.py [module...]
+"""
+
+import subprocess
+import sys
+import typing as T
+
+MODULES = ["pyflate", "pyflate.__main__"]
+
+# Microseconds that importing the CLI may take; enforced by
+# test_import_time.py. Measured at roughly 15 ms on a slow machine.
+BUDGET_US = 50_000
+
+# Modules that decoding does not need and that must not be imported by it.
+UNWANTED = ["unittest", "pprint", "logging", "typing", "argparse", "io"]
+
+
+def import_times(module: str) -> T.Dict[str, T.Tuple[int, int]]:
+    """Import module in a fresh interpreter and return the self and
+    cumulative import time, in microseconds, of every module imported."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    ret = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:") :].split("|")
+        try:
+            own, cumulative = int(fields[0]), int(fields[1])
+        except ValueError:  # the header line
+            continue
+        ret[fields[2].strip()] = (own, cumulative)
+    return ret
+
+
+def cumulative_import_time(module: str, runs: int = 5) -> int:
+    """Return the best cumulative import time of module over runs."""
+    return min(import_times(module)[module][1] for _ in range(runs))
+
+
+def imported_modules(module: str) -> T.Set[str]:
+    """Return the modules that importing module adds to sys.modules."""
+    code = (
+        "import sys; before = set(sys.modules); import " + module
+        + "; print(' '.join(set(sys.modules) - before))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(proc.stdout.split())
+
+
+def _main() -> None:
+    for module in sys.argv[1:] or MODULES:
+        best = cumulative_import_time(module)
+        print(f"{module}: {best / 1000:.2f} ms (budget {BUDGET_US / 1000} ms)")
+        times = import_times(module)
+        for name, (own, cumulative) in sorted(
+            times.items(), key=lambda kv: -kv[1][0]
+        )[:10]:
+            print(f"\t{own:8d} us self {cumulative:8d} us cumulative  {name}")
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Benchmark of pipelined decoding. The gzip file is decoded to /dev/null with
+a SHA-256 of the output, once with the decoder doing everything on one
+thread and once with a Pipeline, checksumming and writing on threads of
+their own. For the latter, the utilization of every stage is reported; the
+busiest stage bounds the throughput.
+
+Usage: python bench_pipeline.py <filename.gz> [buffers]
+"""
+
+import hashlib
+import os
+import sys
+import time
+
+from pyflate import Decoder
+from pyflate.log import null_tracer
+from pyflate.pipeline import BUFFERS, Pipeline, fd_sink
+
+
+def _main(filename: str, buffers: int) -> None:
+    fd = os.open(os.devnull, os.O_WRONLY)
+    try:
+        sink = fd_sink(fd)
+        with open(filename, "rb") as f:
+            start = time.perf_counter()
+            sha = hashlib.sha256()
+            for chunk in Decoder(tracer=null_tracer).chunks(f):
+                sha.update(chunk)
+                sink(chunk)
+            elapsed = time.perf_counter() - start
+        print(f"single thread: {elapsed:8.3f} s  sha256 {sha.hexdigest()[:16]}")
+        with open(filename, "rb") as f:
+            sha = hashlib.sha256()
+            pipeline = Pipeline(sink, [sha], buffers)
+            pipeline.run(f)
+        print(f"pipeline:      {pipeline.elapsed:8.3f} s  sha256 {sha.hexdigest()[:16]}")
+        for name, stage in pipeline.report().items():
+            print(
+                f"  {name:8} busy {stage['busy']:8.3f} s"
+                f"  utilization {stage['utilization']:6.1%}"
+                f"  {stage['items']:6} buffers"
+            )
+    finally:
+        os.close(fd)
+
+
+if __name__ == "__main__":
+    if not 2 <= len(sys.argv) <= 3:
+        program = sys.argv[0]
+        print(program + ":", "usage:", program, "<filename.gz> [buffers]")
+        sys.exit(1)
+    _main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else BUFFERS)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+Benchmark of decoding many small requests, as a long-running service does,
+with a fresh decoder per request (gzip_main) and with a DecoderPool. For
+both, the p50 and p99 latency are reported, along with the memory
+allocated at the peak of a request and the garbage collections run per request.
+
+Usage: python bench_pool.py [requests] [request size]
+"""
+
+import gc
+import gzip
+import io
+import random
+import sys
+import time
+import tracemalloc
+import typing as T
+
+from pyflate import gzip_main
+from pyflate.log import null_tracer
+from pyflate.pool import DecoderPool
+
+
+def payloads(count: int, size: int) -> T.List[bytes]:
+    rng = random.Random(0)
+    words = [b"GET", b"POST", b"/api/v1/items", b"200", b"404", b"user", b"\n"]
+    ret = []
+    for i in range(count):
+        data = b" ".join(rng.choice(words) for _ in range(size // 5))
+        # small requests are often compressed with fixed Huffman codes
+        ret.append(gzip.compress(data, compresslevel=1 if i % 2 else 6, mtime=0))
+    return ret
+
+
+def percentile(times: T.List[float], p: float) -> float:
+    return sorted(times)[min(int(len(times) * p), len(times) - 1)]
+
+
+def measure(
+    decode: T.Callable[[bytes], bytes], requests: T.List[bytes]
+) -> T.Dict[str, float]:
+    collections = 0
+
+    def count(phase: str, info: T.Dict[str, int]) -> None:
+        nonlocal collections
+        if phase == "start":
+            collections += 1
+
+    for data in requests[:10]:  # warm up
+        decode(data)
+    gc.callbacks.append(count)
+    times = []
+    try:
+        for data in requests:
+            start = time.perf_counter()
+            decode(data)
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.callbacks.remove(count)
+    # memory allocated at the peak of a request, on top of what was
+    # allocated before it
+    peak = 0
+    tracemalloc.start()
+    for data in requests[:100]:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        decode(data)
+        peak += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return {
+        "p50": percentile(times, 0.5),
+        "p99": percentile(times, 0.99),
+        "peak": peak / len(requests[:100]),
+        "gc": collections / len(requests),
+    }
+
+
+def _main(count: int, size: int) -> None:
+    requests = payloads(count, size)
+    pool = DecoderPool()
+
+    def fresh_decode(data: bytes) -> bytes:
+        return gzip_main(io.BytesIO(data), tracer=null_tracer)
+
+    fresh = measure(fresh_decode, requests)
+    pooled = measure(pool.decompress, requests)
+    print(f"{'':8} {'p50':>9} {'p99':>9} {'peak bytes':>11} {'gc/request':>11}")
+    for name, m in (("fresh", fresh), ("pooled", pooled)):
+        print(
+            f"{name:8} {m['p50'] * 1e3:7.3f}ms {m['p99'] * 1e3:7.3f}ms"
+            f" {m['peak']:11.0f} {m['gc']:11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    _main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000,
+    )
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark of read-ahead on slow input. The gzip file is read through a
+wrapper that sleeps for every read, simulating the latency of a network
+filesystem, and decoded with and without ReadAhead; for the latter, the
+time the decoder was blocked on I/O is reported separately from the time
+spent decoding.
+
+Usage: python bench_readahead.py <filename.gz> [latency ms] [depth] [block size]
+"""
+
+import sys
+import time
+import typing as T
+
+from pyflate import Decoder
+from pyflate.log import null_tracer
+from pyflate.readahead import BLOCK_SIZE, DEPTH, ReadAhead
+
+
+class SlowFile:
+    """Buffered file wrapper that sleeps latency seconds for every block
+    of block_size bytes it reads from f."""
+
+    def __init__(self, f: T.BinaryIO, latency: float, block_size: int) -> None:
+        self.f = f
+        self.latency = latency
+        self.block_size = block_size
+        self.buffer = b""
+        self.offset = 0
+
+    def read(self, n: int = -1) -> bytes:
+        if self.offset >= len(self.buffer):
+            time.sleep(self.latency)
+            self.buffer, self.offset = self.f.read(self.block_size), 0
+        end = len(self.buffer) if n < 0 else self.offset + n
+        chunk = self.buffer[self.offset : end]
+        self.offset += len(chunk)
+        return chunk
+
+
+def _main(filename: str, latency: float, depth: int, block_size: int) -> None:
+    with open(filename, "rb") as f:
+        start = time.perf_counter()
+        Decoder(tracer=null_tracer).decode(SlowFile(f, latency, block_size))
+        print(f"without read-ahead: {time.perf_counter() - start:8.3f} s")
+    with open(filename, "rb") as f:
+        start = time.perf_counter()
+        with ReadAhead(SlowFile(f, latency, block_size), depth, block_size) as r:
+            Decoder(tracer=null_tracer).decode(r)
+        report = r.report(time.perf_counter() - start)
+    print(
+        f"with read-ahead:    {report['elapsed']:8.3f} s"
+        f" (blocked on I/O {report['io_blocked']:.3f} s,"
+        f" decoding {report['decoding']:.3f} s,"
+        f" reading {report['reading']:.3f} s in {report['blocks']} blocks)"
+    )
+
+
+if __name__ == "__main__":
+    if not 2 <= len(sys.argv) <= 5:
+        program = sys.argv[0]
+        print(program + ":", "usage:", program,
+              "<filename.gz> [latency ms] [depth] [block size]")
+        sys.exit(1)
+    _main(
+        sys.argv[1],
+        float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005,
+        int(sys.argv[3]) if len(sys.argv) > 3 else DEPTH,
+        int(sys.argv[4]) if len(sys.argv) > 4 else BLOCK_SIZE,
+    )
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Benchmark of the two stages of token-level decoding: tokenizing a gzip file
+into LZ77 token blocks, and resolving the tokens back into the output, with
+the pure Python and (if installed) the NumPy backend. The peak memory each
+backend allocates while resolving is reported along with its time.
+
+Without a file, generated inputs are used instead: a run of zeros, where
+merged matches and tiling make the NumPy backend several times faster, and
+log lines, made of many short matches.
+
+Usage: python bench_tokens.py [filename.gz]
+"""
+
+import gzip
+import io
+import random
+import sys
+import time
+import tracemalloc
+import typing as T
+
+from pyflate.tokens import np, resolve, resolve_numpy, tokenize
+
+
+def timed(fn: T.Callable[[], T.Any]) -> T.Tuple[float, T.Any]:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def peak(fn: T.Callable[[], T.Any]) -> int:
+    """Return the peak memory, in bytes, that fn allocates."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def generated() -> T.Iterator[T.Tuple[str, bytes]]:
+    yield "zeros", gzip.compress(bytes(8 << 20), mtime=0)
+    rng = random.Random(0)
+    lines = b"".join(
+        b"2026-10-%02d 12:%02d:%02d GET /api/v1/items/%d 200 %d\n"
+        % (
+            rng.randrange(1, 29),
+            rng.randrange(60),
+            rng.randrange(60),
+            rng.randrange(1000),
+            rng.randrange(10000),
+        )
+        for _ in range(50000)
+    )
+    yield "log lines", gzip.compress(lines, mtime=0)
+
+
+def bench(name: str, payload: bytes) -> None:
+    seconds, blocks = timed(lambda: list(tokenize(io.BytesIO(payload))))
+    tokens = sum(len(block) for block in blocks)
+    print(f"{name}: {len(blocks)} blocks, {tokens} tokens")
+    print(f"  tokenize       {seconds:8.3f} s")
+    python, out = timed(lambda: resolve(blocks))
+    mib = peak(lambda: resolve(blocks)) / (1 << 20)
+    print(f"  resolve        {python:8.3f} s  {mib:7.1f} MiB peak  {len(out)} bytes")
+    if np is not None:
+        vectorized, out = timed(lambda: resolve_numpy(blocks))
+        mib = peak(lambda: resolve_numpy(blocks)) / (1 << 20)
+        print(
+            f"  resolve_numpy  {vectorized:8.3f} s  {mib:7.1f} MiB peak"
+            f"  {python / vectorized:.2f}x"
+        )
+
+
+def _main(filenames: T.List[str]) -> None:
+    if not filenames:
+        for name, payload in generated():
+            bench(name, payload)
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            bench(filename, f.read())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        program = sys.argv[0]
+        print(program + ":", "usage:", program, "[filename.gz]")
+        sys.exit(1)
+    _main(sys.argv[1:])
@@ -1,16 +1,18 @@
 import io
 import gzip
+import array
+import bisect
 import collections
 import colorsys
 import traceback
 
 import pyflate
-import pyflate.huffman
+import pyflate.trace
 
 try:
     from browser import document
     import browser.html as H
-    from browser.html import BR, SPAN as S
+    from browser.html import SPAN as S
 
     BROWSER = True
 except ImportError:
@@ -20,45 +22,11 @@ except ImportError:
     BROWSER = False  # pylint: disable=unreachable
 
 
-# Expressions like "document <= BR()" result in "is assigned to nothing"
+# Expressions like "document <= S()" result in "is assigned to nothing"
 # warning. Let's ignore it:
 #
 # pylint: disable=expression-not-assigned,pointless-statement
 
-# We need a few globals, let's initialize them to None explicitly.
-# log_to_html is a function that logs a message to the output area and will
-# be monkey-patched to log_noop during the dry run.
-#
-# pylint: disable=function-redefined
-bit = log_to_html = None
-log_messages = collections.defaultdict(list)
-
-
-def log_to_html(s, offset=None):
-    """Log the string to the output area. Bind mouseenter and mouseleave
-    events to the element so that we can highlight the corresponding bits
-    in the hexdump and message log."""
-    el = S(s)
-    if offset is not None:
-        el.classList.add(f"message-{offset}")
-        el.classList.add(f"log-message-{offset}")
-        el.bind("mouseenter", el_mouseenter)
-        el.bind("mouseleave", el_mouseleave)
-    document["output"] <= el
-
-
-def log_noop(_, __=None):
-    """No-op log function used during the dry run."""
-    pass
-
-
-def log(*args) -> None:
-    """Log the arguments at the debug level."""
-    offset = bit.tellbits()
-    s = " ".join(map(str, args))
-    log_messages[offset].append(s)
-    log_to_html(f"[{offset}] {s}\n", offset)
-
 
 def equidistributed_color(i):
     """Generate an equidistributed color, so that the bit colors are
@@ -69,157 +37,241 @@ def equidistributed_color(i):
     )
 
 
-def el_mouseleave(ev):
-    """Handle mouseleave event by undoing the highlighting."""
-    cls = ev.target.classList[0]
-    for el in document.getElementsByClassName(cls):
-        el.style.backgroundColor = "white"
+# The hexdump and the log are virtualized: only the rows that are currently
+# visible (plus a few around them) exist in the DOM. Every row has the same
+# height so that the visible rows can be computed from the scroll position.
+ROW_HEIGHT = 11  # px, keep in sync with .row in index.html
+BYTES_PER_ROW = 4
+OVERSCAN = 8
+
+# State of the current visualization, replaced by run_program().
+trace_index = hexdump_view = log_view = None
+log_lines = []
+highlighted = None
+huffman_rows = collections.defaultdict(list)
+
+
+class TraceIndex:
+    """Interval index over the recorded log messages. Records at the same
+    bit offset form one message, and message i explains the bits from the
+    offset of message i - 1 (or 0) up to its own offset."""
+
+    def __init__(self, data: bytes, records):
+        self.data = data
+        self.offsets = array.array("l")
+        self.texts = []
+        # index of the first log row of every message
+        self.first_row = array.array("l")
+        for row, record in enumerate(records):
+            if not self.offsets or self.offsets[-1] != record.offset:
+                self.offsets.append(record.offset)
+                self.texts.append(record.message)
+                self.first_row.append(row)
+            else:
+                self.texts[-1] += "\n" + record.message
+
+    def message_at(self, bit_number: int):
+        """Return the index of the message explaining the bit, if any."""
+        i = bisect.bisect_right(self.offsets, bit_number)
+        return i if i < len(self.offsets) else None
+
+    def message_of_offset(self, offset: int) -> int:
+        return bisect.bisect_left(self.offsets, offset)
+
+    def bit_range(self, message: int):
+        start = self.offsets[message - 1] if message > 0 else 0
+        return start, self.offsets[message]
+
+    def bits_text(self, message: int) -> str:
+        """Return the bits explained by the message, most significant
+        first."""
+        start, end = self.bit_range(message)
+        data = self.data
+        return "".join(
+            str((data[k >> 3] >> (k & 7)) & 1)
+            for k in range(end - 1, start - 1, -1)
+        )
+
+
+class VirtualList:
+    """Scrollable container that only renders its visible rows."""
+
+    def __init__(self, container, row_count: int, render_row):
+        self.container = container
+        self.row_count = row_count
+        self.render_row = render_row
+        self.window = (0, 0)
+        # row number -> element of the rows currently in the DOM
+        self.rows = {}
+        container.clear()
+        spacer = H.DIV(
+            style={
+                "position": "relative",
+                "height": f"{row_count * ROW_HEIGHT}px",
+            }
+        )
+        self.content = H.DIV(
+            style={"position": "absolute", "left": "0", "right": "0"}
+        )
+        spacer <= self.content
+        container <= spacer
+        self.update()
+
+    def visible_rows(self):
+        top = self.container.scrollTop // ROW_HEIGHT
+        bottom = (
+            self.container.scrollTop + self.container.clientHeight
+        ) // ROW_HEIGHT + 1
+        return top, min(bottom, self.row_count)
+
+    def update(self, *_) -> None:
+        """Re-render the rows around the visible ones, if they changed."""
+        top, bottom = self.visible_rows()
+        window = (max(0, top - OVERSCAN), min(self.row_count, bottom + OVERSCAN))
+        if window == self.window and self.rows:
+            return
+        self.window = window
+        self.content.clear()
+        self.content.style.top = f"{window[0] * ROW_HEIGHT}px"
+        self.rows = {}
+        for row in range(*window):
+            el = self.render_row(row)
+            self.rows[row] = el
+            self.content <= el
+
+    def scroll_to(self, row: int) -> None:
+        """Scroll the row into view unless it is visible already."""
+        top, bottom = self.visible_rows()
+        if not top <= row < bottom:
+            self.container.scrollTop = row * ROW_HEIGHT
+
+
+def message_style(message: int) -> str:
+    color = equidistributed_color(message)
+    colors = ",".join(f"{int(c*255)}" for c in color)
+    return f"color: rgb({colors});"
+
+
+def render_hexdump_row(row: int):
+    """Render one row of the hexdump: offset, hex, binary and ASCII
+    representation of BYTES_PER_ROW bytes. Every bit of the binary part
+    carries the index of the message explaining it."""
+    i = row * BYTES_PER_ROW
+    b = trace_index.data[i : i + BYTES_PER_ROW]
+    padding = BYTES_PER_ROW - len(b)
+    el = H.DIV(Class="row")
+    el <= S(f"{i:08x}  " + "".join(f"{c:02x} " for c in b) + "   " * padding)
+    el <= S(" [")
+    for byte_number, c in enumerate(b, i):
+        for n in range(7, -1, -1):
+            bit_number = byte_number * 8 + n
+            bit = S(str((c >> n) & 1))
+            bit.attrs["data-bit"] = str(bit_number)
+            message = trace_index.message_at(bit_number)
+            if message is not None:
+                bit.attrs["data-message"] = str(message)
+                bit.attrs["style"] = message_style(message)
+                bit.attrs["title"] = trace_index.texts[message]
+                if message == highlighted:
+                    bit.style.backgroundColor = "black"
+            el <= bit
+        el <= S(" ")
+    # should we use a dot for non-printable characters?
+    ascii_ = "".join(chr(c) if 32 <= c <= 126 else "." for c in b)
+    el <= S("         " * padding + "] " + ascii_)
+    return el
+
+
+def render_log_row(row: int):
+    """Render one line of the log."""
+    text, message = log_lines[row]
+    el = H.DIV(text, Class="row", title=text)
+    if message is not None:
+        el.attrs["data-message"] = str(message)
+        if message == highlighted:
+            el.style.backgroundColor = "black"
+    return el
+
+
+def set_highlight(message) -> None:
+    """Highlight the rendered bits and log lines of the message, or clear
+    the highlighting if message is None."""
+    global highlighted  # pylint: disable=global-statement
+    highlighted = message
+    color = "black" if message is not None else "white"
+    for view in (hexdump_view, log_view):
+        if view is None:
+            continue
+        for row in view.rows.values():
+            for el in [row] + list(row.children):
+                if "data-message" in el.attrs:
+                    same = int(el.attrs["data-message"]) == message
+                    el.style.backgroundColor = color if same else "white"
+
+
+def el_mouseleave(_):
+    """Handle mouseout by undoing the highlighting."""
+    set_highlight(None)
     document["selected_bits"].text = ""
 
 
 def el_mouseenter(ev):
-    """Handle mouseenter event by highlighting the corresponding bits in
-    the hexdump and message log."""
-
-    cls = ev.target.classList[0]
-    bits = {}
-    for el in document.getElementsByClassName(cls):
-        classes = el.classList
-        for c in classes:
-            if c.startswith("bit-"):
-                class_bits = int(c[4:])
-                t = class_bits
-                bits[t] = el.text
-        el.style.backgroundColor = "black"
-    bits_s = "".join(bits[k] for k in reversed(sorted(bits.keys())))
+    """Handle mouseover by highlighting the corresponding bits in the
+    hexdump and message log. Events are delegated from the containers, so
+    the message is looked up from the data attributes of the target."""
+    target = ev.target
+    if trace_index is None or "data-message" not in target.attrs:
+        return
+    message = int(target.attrs["data-message"])
+    set_highlight(message)
+
+    bits_s = trace_index.bits_text(message)
+    if not bits_s:
+        return
     bits_i = int(bits_s, 2)
     document["selected_bits"].text = f"{bits_s} ({bits_i}, 0x{bits_i:02X})"
 
-    # for all elements with class huffman-{bits_i}, scroll them into view
-    for el in document.getElementsByClassName(f"huffman-{bits_i}"):
+    # scroll the Huffman codes matching the bits into view
+    for el in huffman_rows.get(bits_i, []):
         el.scrollIntoView()
 
-    # figure out if the bit is a bit or a log message.
     # we need to scroll the OPPOSITE type of element into view
-    initiating_element = ev.target
-    is_bit = False
-    for class_name in initiating_element.classList:
-        if class_name.startswith("bit-"):
-            is_bit = True
-            break
-
-    # find element in log and scroll to it.
-    num = cls.split("-")[-1]
-    for el in document.getElementsByClassName(f"message-{num}"):
-
-        # is the element a bit or a log message?
-        el_is_bit = False
-        for class_name in el.classList:
-            if class_name.startswith("bit-"):
-                el_is_bit = True
-                break
-
-        # scroll the opposite type of element into view
-        if el_is_bit != is_bit:
-            el.scrollIntoView()
-            break
-
-
-def gen_bit_to_log_message(data: bytes, log_messages) -> dict:
-    """Generate a mapping from bit number to log message DOM element that
-    has colors and log messages tied to it."""
-
-    log_message_iter = iter(sorted(log_messages.items()))
-    log_message_no = -1
-
-    def next_log_message(log_message_iter):
-        nonlocal log_message_no
-        log_message = next(log_message_iter, None)
-        log_message_s = (
-            "\n".join(log_message[1]) if log_message is not None else ""
-        )
-        log_message_bitno = log_message[0]
-        log_message_no += 1
-        color = equidistributed_color(log_message_no)
-        colors = ",".join(f"{int(c*255)}" for c in color)
-        style = f"color: rgb({colors});"
-        cls = f"message-{log_message[0]}"
-        return log_message_bitno, log_message_s, log_message_no, style, cls
-
-    (
-        log_message_bitno,
-        log_message_s,
-        log_message_no,
-        style,
-        cls,
-    ) = next_log_message(log_message_iter)
-
-    bit_to_log_message = {}
-    for bit_number in range(0, len(data) * 8):
-        # is bit_number still lower than the current log message?
-        # rewind otherwise
-        while bit_number >= log_message_bitno:
-            (
-                log_message_bitno,
-                log_message_s,
-                log_message_no,
-                style,
-                cls,
-            ) = next_log_message(log_message_iter)
-        el = S(style=style, title=log_message_s)
-        el.classList.add(cls)
-        el.classList.add(f"bit-{bit_number}")
-        el.bind("mouseenter", el_mouseenter)
-        el.bind("mouseleave", el_mouseleave)
-        bit_to_log_message[bit_number] = el
-    return bit_to_log_message
-
-
-def print_hexdump(data: bytes) -> None:
+    if "data-bit" in target.attrs:
+        log_view.scroll_to(trace_index.first_row[message])
+    else:
+        start, _ = trace_index.bit_range(message)
+        hexdump_view.scroll_to(start // (BYTES_PER_ROW * 8))
+
+
+def print_hexdump(data: bytes, records) -> None:
     """Print an interactive hexdump with binary representation and ASCII
     representation of the data, allowing to highlight bits in the hexdump
     and see the corresponding log messages."""
-    hd = document["hexdump"]
-    hd.clear()
-
-    bit_to_log_message = gen_bit_to_log_message(data, log_messages)
-    byte_number = 0
-    # We print 4 bytes per line:
-    for i in range(0, len(data), 4):
-        b = data[i : i + 4]
-        # print offset
-        hd <= S(f"{i:08x}  ")
-        # print hex
-        for c in b:
-            hd <= S(f"{c:02x} ")
-        # align hex
-        for _ in range(4 - len(b)):
-            hd <= S("   ")
-        hd <= S(" [")
-        # print binary - this is the complex part
-        for c in b:
-            bits = f"{c:08b}"
-            for n, bit in enumerate(bits):
-                # we keep the ordering, color and log message of the bit
-                # but we change the text to the actual bit
-                bit_number = (byte_number * 8) + (7 - n)
-                el = bit_to_log_message[bit_number]
-                el.text = bit
-                hd <= el
-            hd <= S(" ")
-            byte_number += 1
-        # align binary
-        for _ in range(4 - len(b)):
-            hd <= S("         ")
-        hd <= S("] ")
-        # print ASCII
-        for c in b:
-            # should we use a dot for non-hd <= Sable characters?
-            if c < 32 or c > 126:
-                hd <= S(".")
-            else:
-                hd <= S(chr(c))
-        hd <= BR()
+    global trace_index, hexdump_view  # pylint: disable=global-statement
+    trace_index = TraceIndex(data, records)
+    rows = (len(data) + BYTES_PER_ROW - 1) // BYTES_PER_ROW
+    hexdump_view = VirtualList(document["hexdump"], rows, render_hexdump_row)
+
+
+def print_log(records, extra_lines=()) -> None:
+    """Print the recorded decoder events, followed by extra_lines, to the
+    output area."""
+    global log_lines, log_view  # pylint: disable=global-statement
+    log_lines = []
+    for record in records:
+        message = None
+        if trace_index is not None:
+            message = trace_index.message_of_offset(record.offset)
+        log_lines.append((f"[{record.offset}] {record.message}", message))
+    for line in extra_lines:
+        log_lines.append((line, None))
+    log_view = VirtualList(document["output"], len(log_lines), render_log_row)
+
+
+def clear_hexdump() -> None:
+    global trace_index, hexdump_view  # pylint: disable=global-statement
+    trace_index = hexdump_view = None
+    document["hexdump"].clear()
 
 
 def visualize_huffman(huff1, table_class, is_first=True):
@@ -236,8 +288,8 @@ def visualize_huffman(huff1, table_class, is_first=True):
     for huff in sorted(huff1.table, key=lambda h: h.reverse_symbol):
         huff_row = H.TR()
         rev = str(huff.reverse_symbol)
-        # add huffman_{reverse_symbol} class to the row
-        huff_row.classList.add(f"huffman-{huff.reverse_symbol}")
+        # index the row by its code so that hovering can find it
+        huffman_rows[huff.reverse_symbol].append(huff_row)
         rev += f' (0x{huff.reverse_symbol:02X})'
         huff_row <= H.TD(rev)
         code = str(huff.code)
@@ -271,34 +323,18 @@ def loading_done():
 def run_program(*_, **__) -> None:
     """Run the program. This function is called when the input changes and
     when the page is loaded."""
-    # pylint: disable=global-statement
-    global bit, log_to_html, log_messages
     loading_done()
-    document["output"].text = ""  # Clear previous output
     s = document["input"].value
-    # Backup the original log_to_html function and replace it with a no-op
-    # function during the dry run.
-    #
-    # We do the dry run to get the log messages before we print the hexdump.
-    log_to_html_copy = log_to_html
-    log_to_html = log_noop
-    log_messages = collections.defaultdict(list)
+    # A single decode records everything we need: the log messages for the
+    # hexdump and the output area, and the Huffman tables of the last block.
+    recorder = pyflate.trace.TraceRecorder()
+    huffman_rows.clear()
     try:
         buf = gzip.compress(s.encode(), mtime=0)
-        inp = io.BytesIO(buf)
-
-        # we do a dry run first to get the log messages for hexdump
-        bit = pyflate.Bitfield(inp)
-        noop = lambda *args: None
-        _ = list(pyflate.gzip_main_bitfield(bit, noop))
-
-        # restore the original log_to_html function, re-run the program
-        # and print the hexdump
-        log_to_html = log_to_html_copy
-        inp = io.BytesIO(buf)
-        bit = pyflate.Bitfield(inp)
-        print_hexdump(buf)
-        huff1, huff2 = pyflate.gzip_main_bitfield(bit, noop)
+        recorder.decode(io.BytesIO(buf))
+        print_hexdump(buf, recorder.records)
+        print_log(recorder.records)
+        huff1, huff2 = recorder.tables
         visualize_huffman(huff1, "huffman_browser_table1")
         visualize_huffman(huff2, "huffman_browser_table2", is_first=False)
 
@@ -313,19 +349,22 @@ def run_program(*_, **__) -> None:
         summary += f" Compression ratio: {len(buf) / len(s):.2f}"
         document["compression_result"].text = summary
     except Exception as e:
-        # In case of error, clear the hexdump and log the error message to
-        # the output area. It might be relevant to log the traceback as well.
-        document["hexdump"].clear()
-        log_to_html = log_to_html_copy
-        log(f"Error: {e}")
-        log(traceback.format_exc())
-    finally:
-        # Always restore the original log_to_html function so that the
-        # next invocation of run_program() works as expected.
-        log_to_html = log_to_html_copy
-
-
-pyflate.huffman.log = log
-pyflate.log = log
+        # In case of error, clear the hexdump and log whatever was recorded
+        # before the error, followed by the error message. It might be
+        # relevant to log the traceback as well.
+        clear_hexdump()
+        error = [f"Error: {e}"] + traceback.format_exc().splitlines()
+        print_log(recorder.records, error)
+
+
+for container in (document["hexdump"], document["output"]):
+    container.bind("mouseover", el_mouseenter)
+    container.bind("mouseout", el_mouseleave)
+document["hexdump"].bind(
+    "scroll", lambda ev: hexdump_view is not None and hexdump_view.update()
+)
+document["output"].bind(
+    "scroll", lambda ev: log_view is not None and log_view.update()
+)
 run_program()
 document["input"].bind("input", run_program)
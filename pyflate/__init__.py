@@ -9,11 +9,29 @@
 # This is probably most useful for research purposes/index building;  there
 # is certainly some room for improvement in the Huffman bit-matcher.
 
-import typing as T
-import logging
-from pyflate.bit import Bitfield
-from pyflate.huffman import HuffmanTable, OrderedHuffmanTable
-from pyflate.log import log
+from __future__ import annotations
+
+import zlib
+from pyflate.bit import Bitfield, LengthError
+from pyflate.checkpoint import BLOCK, FOOTER, MEMBER, SYMBOL, Checkpoint
+from pyflate.huffman import CODEGEN_THRESHOLD, HuffmanTable, OrderedHuffmanTable
+from pyflate.limits import DecodeStats, Limits
+from pyflate.log import log_tracer, null_tracer
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+    from pyflate.log import T_TRACER
+
+    T_WR_CB = T.Callable[[bytes], None]
+
+# Output is handed to the write callback in chunks of at least FLUSH_SIZE
+# bytes. Only the last WINDOW_SIZE bytes are kept for back-references.
+WINDOW_SIZE = 32768
+FLUSH_SIZE = 65536
+# Room for the window, output not flushed yet and a stored block on top of
+# that, so that decoding never grows the buffer the output is written into.
+BUFFER_SIZE = WINDOW_SIZE + FLUSH_SIZE + 65536
 
 
 def code_length_orders(i: int) -> int:
@@ -107,13 +125,18 @@ def extra_length_bits(n: int) -> int:
         raise Exception("illegal length code")
 
 
-def load_dynamic_huffman(b: Bitfield) -> T.Tuple[HuffmanTable, HuffmanTable]:
+def load_dynamic_huffman(
+    b: Bitfield,
+    tracer: T_TRACER = log_tracer,
+    stats: T.Optional[DecodeStats] = None,
+) -> T.Tuple[HuffmanTable, HuffmanTable]:
     dyna_start = b.tellbits()
     len_codes = b.readbits(5)
     literals = len_codes + 257
     distances = b.readbits(5) + 1
     code_lengths_length = b.readbits(4) + 4
-    log(
+    tracer(
+        b, "tables",
         "Dynamic Huffman tree: length codes: %s, distances codes: %s, code_lengths_length: %s"
         % (len_codes, distances, code_lengths_length)
     )
@@ -121,10 +144,13 @@ def load_dynamic_huffman(b: Bitfield) -> T.Tuple[HuffmanTable, HuffmanTable]:
     l = [0] * 19
     for i in range(code_lengths_length):
         l[code_length_orders(i)] = b.readbits(3)
-    log("lengths:", l)
+    tracer(b, "tables", "lengths:", l)
 
     dynamic_codes = OrderedHuffmanTable(l)
     dynamic_codes.populate_huffman_symbols()
+    next_code_length = dynamic_codes.tiny_decoder()
+    if stats is not None:
+        stats.count_table("code lengths", next_code_length.width)  # type: ignore
 
     # Decode the code_lengths for both tables at once,
     # then split the list later
@@ -132,7 +158,7 @@ def load_dynamic_huffman(b: Bitfield) -> T.Tuple[HuffmanTable, HuffmanTable]:
     code_lengths: T.List[int] = []
     n = 0
     while n < (literals + distances):
-        r = dynamic_codes.find_next_symbol(b)
+        r = next_code_length(b, tracer=tracer)
         if 0 <= r <= 15:  # literal bitlength for this code
             count = 1
             what = r
@@ -153,15 +179,32 @@ def load_dynamic_huffman(b: Bitfield) -> T.Tuple[HuffmanTable, HuffmanTable]:
         code_lengths += [what] * count
         n += count
 
-    log("Literals/len lengths:", code_lengths[:literals])
-    log("Dist lengths:", code_lengths[literals:])
+    tracer(b, "tables", "Literals/len lengths:", code_lengths[:literals])
+    tracer(b, "tables", "Dist lengths:", code_lengths[literals:])
     main_literals = OrderedHuffmanTable(code_lengths[:literals])
     main_distances = OrderedHuffmanTable(code_lengths[literals:])
-    log("Read dynamic huffman tables", b.tellbits() - dyna_start, "bits")
+    tracer(b, "tables", "Read dynamic huffman tables", b.tellbits() - dyna_start, "bits")
     return main_literals, main_distances
 
 
-def read_gzip_header(b: Bitfield) -> None:
+def parse_extra_field(extra: bytes) -> T.Dict[bytes, bytes]:
+    """Split a GZ_FEXTRA field into its subfields, keyed by their two-byte
+    ID. Like gzip(1), a malformed tail is ignored rather than rejected."""
+    subfields = {}
+    i = 0
+    while i + 4 <= len(extra):
+        length = extra[i + 2] | (extra[i + 3] << 8)
+        if i + 4 + length > len(extra):
+            break
+        subfields[extra[i : i + 2]] = extra[i + 4 : i + 4 + length]
+        i += 4 + length
+    return subfields
+
+
+def read_gzip_header(
+    b: Bitfield, tracer: T_TRACER = log_tracer
+) -> T.Dict[bytes, bytes]:
+    """Read a gzip member header. Return its GZ_FEXTRA subfields."""
     magic = b.readbits(16)
     if magic != 0x8b1f:  # GZip
         raise Exception(
@@ -174,16 +217,21 @@ def read_gzip_header(b: Bitfield) -> None:
 
     # Use flags, drop modification time, extra flags and OS creator type.
     flags = b.readbits(8)
-    log("flags", hex(flags))
+    tracer(b, "header", "flags", hex(flags))
     mtime = b.readbits(32)
-    log("mtime", hex(mtime))
+    tracer(b, "header", "mtime", hex(mtime))
     extra_flags = b.readbits(8)
-    log("extra_flags", hex(extra_flags))
+    tracer(b, "header", "extra_flags", hex(extra_flags))
     os_type = b.readbits(8)
-    log("os_type", hex(os_type))
+    tracer(b, "header", "os_type", hex(os_type))
 
     if flags & 0x04:  # structured GZ_FEXTRA miscellaneous data
-        raise Exception("GZ_FEXTRA not supported")
+        xlen = b.readbits(16)
+        tracer(b, "header", "extra field length", xlen)
+        extra = parse_extra_field(bytes(b.readbits(8) for i in range(xlen)))
+        tracer(b, "header", "extra subfields", extra)
+    else:
+        extra = {}
     while flags & 0x08:  # original GZ_FNAME filename
         if not b.readbits(8):
             break
@@ -192,169 +240,512 @@ def read_gzip_header(b: Bitfield) -> None:
             break
     if flags & 0x02:  # header-only GZ_FHCRC checksum
         b.readbits(16)
+    return extra
+
+
+def static_huffman_tables() -> T.Tuple[HuffmanTable, HuffmanTable]:
+    """Build the fixed Huffman tables. They are never modified once built,
+    so they can be reused for any number of blocks."""
+    static_huffman_bootstrap = [
+        (0, 8),
+        (144, 9),
+        (256, 7),
+        (280, 8),
+        (288, -1),
+    ]
+    static_huffman_lengths_bootstrap = [(0, 5), (32, -1)]
+    main_literals = HuffmanTable(static_huffman_bootstrap)
+    main_distances = HuffmanTable(static_huffman_lengths_bootstrap)
+    main_literals.populate_huffman_symbols()
+    main_distances.populate_huffman_symbols()
+    return main_literals, main_distances
 
 
-def load_huffman_tables(b: Bitfield, blocktype: int) -> T.Tuple[HuffmanTable, HuffmanTable]:
+def load_huffman_tables(
+    b: Bitfield,
+    blocktype: int,
+    tracer: T_TRACER = log_tracer,
+    static: T.Optional[T.Tuple[HuffmanTable, HuffmanTable]] = None,
+    stats: T.Optional[DecodeStats] = None,
+) -> T.Tuple[HuffmanTable, HuffmanTable]:
+    """Load the Huffman tables of a block. static, if given, are the
+    tables returned by static_huffman_tables(), to reuse them."""
     if blocktype == 1:  # Static Huffman
-        log("loading static huffman block")
-        static_huffman_bootstrap = [
-            (0, 8),
-            (144, 9),
-            (256, 7),
-            (280, 8),
-            (288, -1),
-        ]
-        static_huffman_lengths_bootstrap = [(0, 5), (32, -1)]
-        main_literals = HuffmanTable(static_huffman_bootstrap)
-        main_distances = HuffmanTable(static_huffman_lengths_bootstrap)
+        tracer(b, "tables", "loading static huffman block")
+        main_literals, main_distances = static or static_huffman_tables()
 
     elif blocktype == 2:  # Dynamic Huffman
-        log("loading dynamic huffman block")
-        main_literals, main_distances = load_dynamic_huffman(b)
+        tracer(b, "tables", "loading dynamic huffman block")
+        main_literals, main_distances = load_dynamic_huffman(b, tracer, stats)
+        main_literals.populate_huffman_symbols()
+        main_distances.populate_huffman_symbols()
     else:
         raise Exception("illegal unused blocktype in use @" + repr(b.tell()))
-    log('done loading huffman tables')
-
-    # Common path for both Static and Dynamic Huffman decode now
-
-    main_literals.populate_huffman_symbols()
-    main_distances.populate_huffman_symbols()
+    tracer(b, "tables", 'done loading huffman tables')
 
     # log(f'{main_literals=}\n{main_distances=}')
     return main_literals, main_distances
 
 
-T_WR_CB = T.Callable[[bytes], None]
-def gzip_main_bitfield(b: Bitfield, write_callback: T_WR_CB) -> T.Iterator[bytes]:
-
-    read_gzip_header(b)
-
-    log("gzip header skip", b.tell())
-    out = b""
-
-    main_literals = main_distances = None
-
-    # iterate over all blocks
-    while True:
-        log('block start', b.tell())
-        lastbit = b.readbits(1)
-        blocktype = b.readbits(2)
-
-        log("raw block data at", b.tell())
-
-        if blocktype == 3:
-            raise Exception("illegal unused blocktype in use @" + repr(b.tell()))
+def block_estimate(
+    blocktype: int, literals: HuffmanTable, previous: T.Optional[int]
+) -> int:
+    """Estimate the number of symbols in a block before decoding it: as
+    many as in the previous block of the member, if any. Otherwise the
+    rarest symbol of a dynamic block, which has the longest code, occurs
+    about once in 2 ** longest symbols; the fixed codes give no hint, and
+    encoders choose them for short blocks."""
+    if previous is not None:
+        return previous
+    if blocktype == 2 and literals.table:
+        return 1 << literals.table[-1].bits >> 1
+    return 0
+
+
+def more_members(b: Bitfield) -> bool:
+    """Skip the zero padding after a gzip member. Return whether another
+    member follows."""
+    try:
+        while b.snoopbits(8) == 0:
+            b.readbits(8)
+    except LengthError:
+        return False
+    return True
+
+
+class Decoder:
+    """
+    Decoder of gzip streams. All decoding state lives in the instance: the
+    tracer, the limits and running stats, the Huffman tables of the current
+    block, the window and the sink the output is written to.
+
+    Thread safety: an instance must only be used by one thread at a time,
+    but instances share no mutable state, so any number of them can decode
+    concurrently, with or without the GIL. The only state shared between
+    them is the cache of specialized Huffman decoders, which is locked.
+    Tracers are called from the decoding thread; a tracer shared between
+    decoders, such as log_tracer, has to be thread-safe itself.
+    """
+
+    def __init__(
+        self,
+        sink: T.Optional[T_WR_CB] = None,
+        tracer: T_TRACER = log_tracer,
+        limits: T.Optional[Limits] = None,
+        codegen: T.Optional[bool] = None,
+    ) -> None:
+        """The output is passed to sink in chunks. codegen selects how the
+        Huffman tables of a block are decoded: with specialized generated
+        functions if true, with the generic find_next_symbol() if false,
+        and by default with the former for blocks expected to hold
+        CODEGEN_THRESHOLD symbols or more, see block_estimate()."""
+        self.sink = sink
+        self.tracer = tracer
+        self.limits = limits
+        self.codegen = codegen
+        # built on the first fixed Huffman block, then kept across streams
+        self.static_tables: T.Optional[T.Tuple[HuffmanTable, HuffmanTable]] = None
+        self.stats = DecodeStats()
+        # The window followed by the output not flushed yet, in the first
+        # self.end bytes. The buffer never shrinks, so a decoder that is
+        # reset and reused does not allocate it again.
+        self.window = bytearray(BUFFER_SIZE)
+        # Set by pipelines, see pyflate.pipeline: whether the decoder checks
+        # the CRC of every member, or only records its footer for the
+        # pipeline to check, and where the buffers for output chunks come
+        # from, if not freshly allocated.
+        self.check_crc = True
+        self.footers: T.List[T.Tuple[int, int]] = []
+        self.new_buffer: T.Optional[T.Callable[[], bytearray]] = None
+        # Bytes of output still to be dropped rather than handed out, as
+        # when GzipReader.seek() skips forward. They are counted and their
+        # CRC is checked as usual, but no chunk is made of them.
+        self.discard = 0
+        self.reset()
+        # where decoding can resume, see Decoder.resume()
+        self.checkpoint = Checkpoint()
+
+    def reset(self) -> None:
+        """Forget the previous stream, keeping the configuration and the
+        buffers, so that the decoder can be reused."""
+        self.stats.reset()
+        self.tables: T.Tuple[T.Optional[HuffmanTable], T.Optional[HuffmanTable]]
+        self.tables = (None, None)
+        self.end = self.flushed = 0
+        self.crc = self.size = 0
+        self.origin = 0  # bit offset of b in the stream
+        del self.footers[:]
+
+    def chunks_bitfield(
+        self, b: Bitfield, resume: T.Optional[Checkpoint] = None
+    ) -> T.Iterator[bytes]:
+        """Decode the gzip stream in b, yielding the output in chunks. If
+        the input runs out, LengthError is raised after yielding all the
+        output so far, and self.checkpoint tells where to resume."""
+        if resume is None:
+            self.reset()
+        else:
+            self._restore(b, resume)
+        # Concatenated members, optionally separated by zero padding, decode
+        # to the concatenation of their contents, like with gzip(1).
+        yield from self.member_chunks(b, resume)
+        while more_members(b):
+            yield from self.member_chunks(b)
+        self._save(MEMBER, b.tellbits())
+
+    def resume(self, f: T.BinaryIO, checkpoint: Checkpoint) -> T.Iterator[bytes]:
+        """Carry on decoding from checkpoint, yielding the output that
+        follows it. f has to be seekable and positioned where decoding
+        originally started."""
+        f.seek(f.tell() + (checkpoint.position >> 3))
+        return self.chunks_bitfield(Bitfield(f), checkpoint)
+
+    def _restore(self, b: Bitfield, checkpoint: Checkpoint) -> None:
+        self.reset()
+        self.origin = checkpoint.position & ~7
+        b.readbits(checkpoint.position & 7)
+        self.end = self.flushed = len(checkpoint.window)
+        self.window[: self.end] = checkpoint.window
+        self.crc, self.size = checkpoint.crc, checkpoint.size
+        self.stats.output = checkpoint.output
+        self.stats.input_offset = self.origin >> 3
+
+    def _save(
+        self, state: int, position: int, lastbit: int = 0, blocktype: int = 0
+    ) -> None:
+        literal_lengths = distance_lengths = ()
+        if state == SYMBOL and blocktype == 2:
+            literal_lengths = self.tables[0].lengths  # type: ignore
+            distance_lengths = self.tables[1].lengths  # type: ignore
+        self.checkpoint = Checkpoint(
+            state,
+            self.origin + position,
+            lastbit,
+            blocktype,
+            literal_lengths,
+            distance_lengths,
+            self.window[: self.end] if state != MEMBER else b"",
+            self.crc,
+            self.size,
+            self.stats.output,
+        )
 
-        if blocktype == 0:
-            b.align()
-            length = b.readbits(16)
-            if length & b.readbits(16):
-                raise Exception("stored block lengths do not match each other")
-            for i in range(length):
-                toadd += bytes([b.readbits(8)])
-                out += toadd
-                write_callback(toadd)
-            continue
-
-        main_literals, main_distances = load_huffman_tables(b, blocktype)
-
-        literal_count = 0  # used to calculate literal_start
-        literal_start = 0
-
-        log('reading literals: ', b.tell())
-        while True:
-            lz_start = b.tellbits()
-            r = main_literals.find_next_symbol(b)
-            if r == 256:
-                if literal_count > 0:
-                    # print 'add 0 count', literal_count, 'bits', lz_start-literal_start, 'data', `out[-literal_count:]`
-                    literal_count = 0
-                log("eos 0 count 0 bits", b.tellbits() - lz_start)
-                log("end of Huffman block encountered")
-                break
-            if 0 <= r <= 255:
-                if literal_count == 0:
-                    literal_start = lz_start
-                literal_count += 1
-                buf = bytes([r])
-                log(f'found literal {buf}. {r=}, {hex(r)=}')
-                toadd = bytes([r])
-                out += toadd
-                write_callback(toadd)
-            elif 257 <= r <= 285:  # dictionary lookup
-                if literal_count > 0:
-                    # print 'add 0 count', literal_count, 'bits', lz_start-literal_start, 'data', `out[-literal_count:]`
-                    literal_count = 0
-                log("reading", extra_length_bits(r), "extra bits for len")
-                length_extra = b.readbits(extra_length_bits(r))
-                length = length_base(r) + length_extra
-                log("length", length)
-
-                r1 = main_distances.find_next_symbol(b)
-                log("r1=", r1)
-                if 0 <= r1 <= 29:
-                    log("reading", extra_distance_bits(r1), "extra bits for dist")
-                    distance = distance_base(r1) + b.readbits(
-                        extra_distance_bits(r1)
-                    )
-                    log("distance", distance)
-                    cached_length = length
-                    while length > distance:
-                        toadd = out[-distance:]
-                        out += toadd
-                        write_callback(toadd)
-                        length -= distance
-                    if length == distance:
-                        toadd = out[-distance:]
-                        out += toadd
-                        write_callback(toadd)
-                    else:
-                        toadd = out[-distance : length - distance]
-                        out += toadd
-                        write_callback(toadd)
-                    log("dictionary lookup: length", cached_length)
-                    log(
-                        "copy",
-                        -distance,
-                        "num bits",
-                        b.tellbits() - lz_start,
-                        "data",
-                        repr(out[-cached_length:]),
+    def _resume_tables(
+        self, checkpoint: Checkpoint
+    ) -> T.Tuple[HuffmanTable, HuffmanTable]:
+        if checkpoint.blocktype == 1:
+            if self.static_tables is None:
+                self.static_tables = static_huffman_tables()
+            return self.static_tables
+        main_literals = OrderedHuffmanTable(list(checkpoint.literal_lengths))
+        main_distances = OrderedHuffmanTable(list(checkpoint.distance_lengths))
+        main_literals.populate_huffman_symbols()
+        main_distances.populate_huffman_symbols()
+        return main_literals, main_distances
+
+    def chunks(self, f: T.BinaryIO) -> T.Iterator[bytes]:
+        return self.chunks_bitfield(Bitfield(f))
+
+    def decode_bitfield(
+        self, b: Bitfield
+    ) -> T.Tuple[T.Optional[HuffmanTable], T.Optional[HuffmanTable]]:
+        """Decode the gzip stream in b into the sink. Return the Huffman
+        tables of the last compressed block."""
+        sink = self.sink
+        if sink is None:
+            raise Exception("Decoder.decode_bitfield() needs a sink")
+        for chunk in self.chunks_bitfield(b):
+            sink(chunk)
+        return self.tables
+
+    def decode(self, f: T.BinaryIO) -> bytes:
+        """Decode the gzip stream in f and return its contents."""
+        return b"".join(self.chunks(f))
+
+    def _flush(self, b: Bitfield) -> bytes:
+        out, end, flushed = self.window, self.end, self.flushed
+        if end == flushed:
+            # nothing to hand out, and no buffer to take from a pipeline
+            return b""
+        chunk = b""
+        with memoryview(out) as view:
+            if self.discard:
+                # counted and checksummed in place, without making a chunk
+                skipped = min(end - flushed, self.discard)
+                if self.check_crc:
+                    self.crc = zlib.crc32(view[flushed : flushed + skipped], self.crc)
+                self.discard -= skipped
+                self.size += skipped
+                self.stats.output += skipped
+                flushed += skipped
+            if flushed < end:
+                if self.new_buffer is None:
+                    chunk = bytes(view[flushed:end])
+                else:
+                    chunk = self.new_buffer()  # type: ignore
+                    chunk[:] = view[flushed:end]
+                if self.check_crc:
+                    self.crc = zlib.crc32(chunk, self.crc)
+                self.size += len(chunk)
+                self.stats.output += len(chunk)
+            if self.limits is not None:
+                self.limits.check(b, self.stats)
+            if end > WINDOW_SIZE:
+                # move the window to the front, memmove()d by the memoryview
+                view[:WINDOW_SIZE] = view[end - WINDOW_SIZE : end]
+                self.end = end = WINDOW_SIZE
+        self.flushed = end
+        return chunk
+
+    def raw_chunks_bitfield(self, b: Bitfield) -> T.Iterator[bytes]:
+        """Decode the raw DEFLATE stream in b, without gzip framing, as in
+        ZIP files, yielding the output in chunks. Nothing can be checked
+        against a footer: self.crc and self.size are left to the caller."""
+        self.reset()
+        yield from self.member_chunks(b, raw=True)
+
+    def member_chunks(
+        self, b: Bitfield, resume: T.Optional[Checkpoint] = None, raw: bool = False
+    ) -> T.Iterator[bytes]:
+        """Decode one gzip member, or a raw DEFLATE stream if raw, yielding
+        its output in chunks. If resume is given, carry on from that
+        checkpoint within the member."""
+        tracer, limits, stats = self.tracer, self.limits, self.stats
+        traced = tracer is not null_tracer
+
+        state = MEMBER if resume is None else resume.state
+        if state == MEMBER:
+            member_start = b.tellbits()
+            try:
+                if not raw:
+                    read_gzip_header(b, tracer)
+            except LengthError:
+                self._save(MEMBER, member_start)
+                raise
+
+            tracer(b, "header", "gzip header skip", b.tell())
+            self.end = self.flushed = 0
+            self.crc = self.size = 0
+            self.tables = (None, None)
+            state = BLOCK
+        out = self.window
+        end, flushed = self.end, self.flushed
+
+        # If the input runs out, decoding resumes at the start of the block,
+        # the symbol or the footer being read, as where tells.
+        where = BLOCK
+        block_start = lz_start = footer_start = b.tellbits()
+        lastbit = blocktype = 0
+        expected: T.Optional[int] = None  # symbols in the previous block
+        try:
+            # iterate over all blocks
+            while state != FOOTER:
+                where, block_start = BLOCK, b.tellbits()
+                if state == SYMBOL:
+                    assert resume is not None
+                    lastbit, blocktype = resume.lastbit, resume.blocktype
+                    main_literals, main_distances = self._resume_tables(resume)
+                    state = BLOCK
+                else:
+                    tracer(b, "block", 'block start', b.tell())
+                    stats.blocks += 1
+                    if limits is not None:
+                        limits.check(b, stats)
+                    lastbit = b.readbits(1)
+                    blocktype = b.readbits(2)
+
+                    tracer(b, "block", "raw block data at", b.tell())
+
+                    if blocktype == 3:
+                        raise Exception("illegal unused blocktype in use @" + repr(b.tell()))
+
+                    if blocktype == 0:
+                        b.align()
+                        length = b.readbits(16)
+                        if length != b.readbits(16) ^ 0xFFFF:
+                            raise Exception("stored block lengths do not match each other")
+                        out[end : end + length] = bytes(
+                            b.readbits(8) for i in range(length)
+                        )
+                        end += length
+                        if end - flushed >= FLUSH_SIZE:
+                            self.end = end
+                            chunk = self._flush(b)
+                            end, flushed = self.end, self.flushed
+                            if chunk:
+                                yield chunk
+                        if lastbit:
+                            break
+                        continue
+
+                    if blocktype == 1 and self.static_tables is None:
+                        self.static_tables = static_huffman_tables()
+                    main_literals, main_distances = load_huffman_tables(
+                        b, blocktype, tracer, self.static_tables, stats
                     )
-                if 30 <= r1 <= 31:
-                    raise Exception(
-                        "illegal unused distance symbol in use @" + repr(b.tell())
-                    )
-            elif 286 <= r <= 287:
-                raise Exception(
-                    "illegal unused literal/length symbol in use @" + repr(b.tell())
-                )
-
-        if lastbit:
-            log("this was the last block, time to leave", b.tell())
-            break
-
-    footer_start = b.tell()
-    bfooter_start = b.tellbits()
-    b.align()
-    log("end of stream, aligning to byte boundary")
-    crc = b.readbits(32)
-    log("crc")
-    final_length = b.readbits(32)
-    log("final length")
-    # print len(out)
-    next_unused = b.tell()
-    # print 'deflate-end-of-stream', 5, 'beginning at', footer_start, 'raw data at', next_unused, 'bits', b.tellbits() - bfooter_start
-    # print 'crc', hex(crc), 'final length', final_length
-    # print 'header 0 count 0 bits', b.tellbits()-bfooter_start
-    return (main_literals, main_distances)
-
-
-def gzip_main(f: T.BinaryIO) -> bytes:
-    b = Bitfield(f)
-    out = ""
-    def write_callback(buf: bytes) -> None:
-        nonlocal out
-        out += buf
-    gzip_main_bitfield(b, write_callback)
-    return out
+                self.tables = (main_literals, main_distances)
+                specialize = self.codegen
+                if specialize is None:
+                    # decided up front: switching within the block would
+                    # make blocks just past the switch slower either way
+                    estimate = block_estimate(blocktype, main_literals, expected)
+                    specialize = estimate >= CODEGEN_THRESHOLD
+                if specialize:
+                    # size the tables for a block like the previous one
+                    next_literal = main_literals.specialize(traced, expected)
+                    next_distance = main_distances.specialize(traced, expected)
+                    width = next_literal.width  # type: ignore
+                    stats.count_table("literals", width)
+                    stats.count_table("distances", next_distance.width)  # type: ignore
+                else:
+                    next_literal = main_literals.find_next_symbol
+                    next_distance = main_distances.find_next_symbol
+                    width = 0
+
+                literal_count = 0  # used to calculate literal_start
+                literal_start = 0
+                symbols = counted = 0
+
+                where = SYMBOL
+                tracer(b, "block", 'reading literals: ', b.tell())
+                while True:
+                    lz_start = b.tellbits()
+                    r = next_literal(b, tracer=tracer)
+                    symbols += 1
+                    if r == 256:
+                        if literal_count > 0:
+                            # print 'add 0 count', literal_count, 'bits', lz_start-literal_start, 'data', `out[-literal_count:]`
+                            literal_count = 0
+                        tracer(b, "eob", "eos 0 count 0 bits", b.tellbits() - lz_start)
+                        tracer(b, "eob", "end of Huffman block encountered")
+                        break
+                    if 0 <= r <= 255:
+                        if literal_count == 0:
+                            literal_start = lz_start
+                        literal_count += 1
+                        buf = bytes([r])
+                        tracer(b, "literal", f'found literal {buf}. {r=}, {hex(r)=}')
+                        out[end] = r
+                        end += 1
+                    elif 257 <= r <= 285:  # dictionary lookup
+                        if literal_count > 0:
+                            # print 'add 0 count', literal_count, 'bits', lz_start-literal_start, 'data', `out[-literal_count:]`
+                            literal_count = 0
+                        tracer(b, "length", "reading", extra_length_bits(r), "extra bits for len")
+                        length_extra = b.readbits(extra_length_bits(r))
+                        length = length_base(r) + length_extra
+                        tracer(b, "length", "length", length)
+
+                        r1 = next_distance(b, tracer=tracer)
+                        tracer(b, "distance", "r1=", r1)
+                        if 0 <= r1 <= 29:
+                            tracer(b, "distance", "reading", extra_distance_bits(r1), "extra bits for dist")
+                            distance = distance_base(r1) + b.readbits(
+                                extra_distance_bits(r1)
+                            )
+                            tracer(b, "distance", "distance", distance)
+                            if distance > end:
+                                raise Exception(
+                                    "invalid distance too far back @" + repr(b.tell())
+                                )
+                            start = end - distance
+                            if length <= distance:
+                                out[end : end + length] = out[start : start + length]
+                            else:
+                                # overlapping copy: repeat the last distance bytes
+                                repeat = out[start:end] * (length // distance + 1)
+                                out[end : end + length] = repeat[:length]
+                            end += length
+                            tracer(b, "match", "dictionary lookup: length", length)
+                            tracer(
+                                b, "match",
+                                "copy",
+                                -distance,
+                                "num bits",
+                                b.tellbits() - lz_start,
+                                "data",
+                                repr(bytes(out[end - length : end])),
+                            )
+                        if 30 <= r1 <= 31:
+                            raise Exception(
+                                "illegal unused distance symbol in use @" + repr(b.tell())
+                            )
+                    elif 286 <= r <= 287:
+                        raise Exception(
+                            "illegal unused literal/length symbol in use @" + repr(b.tell())
+                        )
+                    if end - flushed >= FLUSH_SIZE:
+                        stats.symbols += symbols - counted
+                        counted = symbols
+                        self.end = end
+                        chunk = self._flush(b)
+                        end, flushed = self.end, self.flushed
+                        if chunk:
+                            yield chunk
+                stats.symbols += symbols - counted
+                stats.count_symbols(width, symbols)
+                expected = symbols
+                where = BLOCK
+
+                if lastbit:
+                    tracer(b, "block", "this was the last block, time to leave", b.tell())
+                    break
+
+            self.end = end
+            chunk = self._flush(b)
+            end = self.end
+            if chunk:
+                yield chunk
+            if raw:
+                return
+            where, footer_start = FOOTER, b.tellbits()
+            b.align()
+            tracer(b, "footer", "end of stream, aligning to byte boundary")
+            final_crc = b.readbits(32)
+            tracer(b, "footer", "crc")
+            final_length = b.readbits(32)
+            tracer(b, "footer", "final length")
+        except LengthError:
+            # hand out everything decoded so far, then record where to resume
+            self.end = end
+            chunk = self._flush(b)
+            if chunk:
+                yield chunk
+            position = {BLOCK: block_start, SYMBOL: lz_start, FOOTER: footer_start}
+            self._save(where, position[where], lastbit, blocktype)
+            raise
+        if not self.check_crc:
+            self.footers.append((final_crc, final_length))
+        elif final_crc != self.crc:
+            raise Exception("CRC check failed @" + repr(b.tell()))
+        if final_length != self.size & 0xFFFFFFFF:
+            raise Exception("incorrect length of data produced @" + repr(b.tell()))
+
+
+def gzip_main_bitfield(
+    b: Bitfield,
+    write_callback: T_WR_CB,
+    tracer: T_TRACER = log_tracer,
+    limits: T.Optional[Limits] = None,
+    codegen: T.Optional[bool] = None,
+) -> T.Tuple[T.Optional[HuffmanTable], T.Optional[HuffmanTable]]:
+    return Decoder(write_callback, tracer, limits, codegen).decode_bitfield(b)
+
+
+def __getattr__(name: str) -> T.Any:
+    # GzipReader needs io, which decoding itself does not, so it is only
+    # imported on first use
+    if name == "GzipReader":
+        from pyflate.reader import GzipReader
+
+        return GzipReader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def gzip_main(
+    f: T.BinaryIO,
+    limits: T.Optional[Limits] = None,
+    tracer: T_TRACER = log_tracer,
+    codegen: T.Optional[bool] = None,
+) -> bytes:
+    return Decoder(None, tracer, limits, codegen).decode(f)
@@ -5,33 +5,46 @@
 # You may use and distribute this code under any DFSG-compatible
 # license (eg. BSD, GNU GPLv2).
 
-import logging
+# Only what decoding needs is imported up front: this runs once per file
+# from shell loops, so the start-up time matters.
 import sys
 
 from pyflate.bit import Bitfield
-from pyflate import gzip_main
+from pyflate import gzip_main_bitfield
+from pyflate.log import log_tracer, null_tracer
 
 
-def _main() -> None:
-    # set to debug, add timestamp in square brackets
-    fmt = "%(asctime)s %(levelname)s: %(message)s"
-    logging.basicConfig(level=logging.DEBUG, format=fmt)
-    filename = sys.argv[1]
-    inp = open(filename, "rb")
-    out = gzip_main(inp)
+def _main(filename: str, verbose: bool = False) -> None:
+    if verbose:
+        import logging
 
-    # f = open('/dev/stdout', 'w')
-    f = sys.stdout
-    f.write(out.decode())
+        # set to debug, add timestamp in square brackets
+        fmt = "%(asctime)s %(levelname)s: %(message)s"
+        logging.basicConfig(level=logging.DEBUG, format=fmt)
+    tracer = log_tracer if verbose else null_tracer
+    with open(filename, "rb") as inp:
+        gzip_main_bitfield(Bitfield(inp), sys.stdout.buffer.write, tracer)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
+    args = sys.argv[1:]
+    if args[:1] == ["grep"]:
+        from pyflate.grep import _main as grep_main
+
+        sys.exit(grep_main(args[1:]))
+    verbose = "-v" in args
+    if verbose:
+        args.remove("-v")
+    if len(args) != 1:
         program = sys.argv[0]
-        print("usage:", program, "<filename.gz>")
+        print("usage:", program, "[-v] <filename.gz>")
+        print("      ", program, "grep [-F] [-i] [-n] [-b] [-m NUM] PATTERN <filename.gz>")
         print(
-            '\tThe contents will be decoded and decompressed plaintext written to "./out".'
+            "\tThe contents will be decoded and decompressed plaintext "
+            "written to standard output."
         )
+        print("\t-v logs every decoded symbol to standard error.")
+        print("\tgrep prints the lines matching PATTERN, like zgrep(1).")
         sys.exit(1)
 
-    _main()
+    _main(args[0], verbose)
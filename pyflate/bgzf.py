@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+BGZF reader. BGZF files (written by bgzip/samtools or pyflate.encoder) are
+gzip files made of independent members, each of which stores its own
+compressed size in a BC (BSIZE) FEXTRA subfield. That lets the reader
+find every member in O(1) from the previous one, without decoding. The
+members can then be decoded in parallel across a process pool.
+
+Positions inside a BGZF file are addressed by virtual offsets:
+(compressed offset of the member << 16) | offset within its contents.
+
+Usage: python -m pyflate.bgzf [-j <processes>] <filename.gz>
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import os
+import struct
+import sys
+import typing as T
+
+from pyflate import gzip_main, parse_extra_field
+
+# Members are handed to the workers in batches of this many, to amortize
+# the inter-process overhead; each member holds up to 64 KiB.
+BATCH_SIZE = 16
+
+
+class BgzfMember(T.NamedTuple):
+    offset: int  # compressed offset of the member in the file
+    size: int  # compressed size of the member, BSIZE + 1
+
+
+def make_virtual_offset(coffset: int, uoffset: int) -> int:
+    return (coffset << 16) | uoffset
+
+
+def split_virtual_offset(voffset: int) -> T.Tuple[int, int]:
+    return voffset >> 16, voffset & 0xFFFF
+
+
+def read_bsize(f: T.BinaryIO) -> T.Optional[int]:
+    """Read the header of the member at the current position of f and
+    return the total size of the member, or None at the end of the file.
+    The position of f is left after the FEXTRA field."""
+    head = f.read(12)
+    if not head:
+        return None
+    if len(head) < 12:
+        raise Exception("truncated BGZF member header: " + repr(head))
+    magic, method, flags, xlen = struct.unpack("<HBB6xH", head)
+    if magic != 0x8B1F or method != 8 or not flags & 0x04:
+        raise Exception("not a BGZF member header: " + repr(head))
+    bc = parse_extra_field(f.read(xlen)).get(b"BC")
+    if bc is None or len(bc) != 2:
+        raise Exception("BGZF member without a BSIZE subfield")
+    return (bc[0] | (bc[1] << 8)) + 1
+
+
+def members(f: T.BinaryIO, offset: int = 0) -> T.Iterator[BgzfMember]:
+    """Iterate over the members of a BGZF file, jumping from one header to
+    the next."""
+    while True:
+        f.seek(offset)
+        size = read_bsize(f)
+        if size is None:
+            return
+        yield BgzfMember(offset, size)
+        offset += size
+
+
+def decompress_member(data: bytes) -> bytes:
+    """Decode a single member."""
+    return gzip_main(io.BytesIO(data))
+
+
+def _decompress_members(
+    path: str, batch: T.List[BgzfMember]
+) -> T.List[bytes]:
+    with open(path, "rb") as f:
+        f.seek(batch[0].offset)
+        data = f.read(batch[-1].offset + batch[-1].size - batch[0].offset)
+    start = batch[0].offset
+    return [
+        decompress_member(data[m.offset - start : m.offset - start + m.size])
+        for m in batch
+    ]
+
+
+def decompress_parallel(
+    path: str, processes: T.Optional[int] = None
+) -> T.Iterator[bytes]:
+    """Decode the BGZF file at path across a process pool, yielding the
+    contents of its members in order. Only a bounded number of batches is
+    in flight at any time, so memory use does not grow with the file."""
+
+    def batches(f: T.BinaryIO) -> T.Iterator[T.List[BgzfMember]]:
+        batch = []
+        for member in members(f):
+            batch.append(member)
+            if len(batch) == BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    processes = processes or os.cpu_count() or 1
+    with open(path, "rb") as f, concurrent.futures.ProcessPoolExecutor(
+        processes
+    ) as pool:
+        in_flight: T.Deque[concurrent.futures.Future] = collections.deque()
+        limit = 4 * processes
+        for batch in batches(f):
+            in_flight.append(pool.submit(_decompress_members, path, batch))
+            if len(in_flight) >= limit:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+class BgzfReader:
+    """Random access to the contents of a BGZF file by virtual offset.
+    Reads continue sequentially into the following members."""
+
+    def __init__(self, f: T.BinaryIO) -> None:
+        self.f = f
+        self.block_offset = -1
+        self.next_offset = 0
+        self.block = b""
+        self.within = 0
+
+    def _load(self, coffset: int) -> bool:
+        """Decode the member at coffset. Return False at end of file."""
+        self.f.seek(coffset)
+        size = read_bsize(self.f)
+        if size is None:
+            return False
+        self.f.seek(coffset)
+        self.block = decompress_member(self.f.read(size))
+        self.block_offset = coffset
+        self.next_offset = coffset + size
+        self.within = 0
+        return True
+
+    def seek_virtual(self, voffset: int) -> None:
+        coffset, within = split_virtual_offset(voffset)
+        if coffset != self.block_offset and not self._load(coffset):
+            raise Exception("virtual offset past the end of the file")
+        if within > len(self.block):
+            raise Exception("virtual offset past the end of its member")
+        self.within = within
+
+    def tell_virtual(self) -> int:
+        return make_virtual_offset(max(self.block_offset, 0), self.within)
+
+    def read(self, n: int = -1) -> bytes:
+        ret = []
+        while n:
+            if self.within >= len(self.block):
+                if not self._load(self.next_offset):
+                    break
+                continue
+            end = len(self.block) if n < 0 else self.within + n
+            chunk = self.block[self.within : end]
+            self.within += len(chunk)
+            ret.append(chunk)
+            if n > 0:
+                n -= len(chunk)
+        return b"".join(ret)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Decode a BGZF file in parallel to standard output."
+    )
+    parser.add_argument("filename")
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    args = parser.parse_args()
+    out = sys.stdout.buffer
+    for chunk in decompress_parallel(args.filename, args.jobs):
+        out.write(chunk)
+
+
+if __name__ == "__main__":
+    _main()
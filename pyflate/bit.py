@@ -16,9 +16,11 @@ There are also convenience functions for gzip format, such as align().
 # You may use and distribute this code under any DFSG-compatible
 # license (eg. BSD, GNU GPLv2).
 
-import logging  # for __main__ testing only
-import typing as T
-from pyflate.log import log
+from __future__ import annotations
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
 
 
 class LengthError(Exception):
@@ -107,73 +109,37 @@ class Bitfield:
         return r
 
 
-import unittest
-import io
-
-
-class TestBitfield(unittest.TestCase):
+class BitWriter:
     """
-    Test cases for the Bitfield class.
+    Bitfield writer, the counterpart of Bitfield. Bits are packed starting
+    from the least significant bit of every byte, as DEFLATE expects.
     """
 
-    def test_bitfieldu_read(self) -> None:
-        """
-        Test reading bits from a Bitfield object.
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.bits = 0
+        self.bitfield = 0x0
 
-        The test case reads the bits from a Bitfield object and checks
-        if the bits are read correctly. We also check if the current
-        position is updated correctly. The test case also checks if the
-        LengthError exception is raised when the end of the stream is
-        reached.
-        """
-        b = Bitfield(io.BytesIO(b"\x01"))
-        self.assertEqual(b.readbits(1), 1)
-        self.assertEqual(b.tell(), (0, 1))
-        # surprisingly, no exception is raised yet
-        self.assertEqual(b.readbits(1), 0)
-        self.assertEqual(b.tell(), (0, 2))
-        try:
-            b.readbits(8)
-            self.fail("expected exception")  # pragma: no cover
-        except LengthError:
-            pass
-
-    def test_snoop(self) -> None:
-        """
-        Test snooping bits from a Bitfield object.
-        """
-        digit = 0b0110
-        b = Bitfield(io.BytesIO(bytes([digit, digit])))
-        self.assertEqual(b.snoopbits(2), 0b10)
-        # once again, no _needbits now
-        self.assertEqual(b.snoopbits(2), 0b10)
-        self.assertEqual(b.readbits(2), 0b10)
-        # trigger the needbit
-        self.assertEqual(b.snoopbits(8), 0b10000001)
-        self.assertEqual(b.readbits(8), 0b10000001)
-
-    def test_to_skip(self) -> None:
-        """
-        Test the toskip() method of the Bitfield object.
-        """
-        b = Bitfield(io.BytesIO(bytes([0b10101, 0b1])))
-        self.assertEqual(b.bitfield, 0)
-        self.assertEqual(b.toskip(), 0)
-        b.readbits(1)
-        self.assertEqual(b.toskip(), 0b111)
+    def writebits(self, v: int, n: int) -> None:
+        """Write the n low bits of v."""
+        self.bitfield |= v << self.bits
+        self.bits += n
+        while self.bits >= 8:
+            self.data.append(self.bitfield & 0xFF)
+            self.bitfield >>= 8
+            self.bits -= 8
 
-    def test_align(self) -> None:
-        """
-        Test the align() method of the Bitfield object.
-        """
-        b = Bitfield(io.BytesIO(bytes([2, 1, 3, 7])))
-        self.assertEqual(b.tellbits(), 0)
-        b.readbits(1)
-        self.assertEqual(b.toskip(), 0b111)
-        b.align()
-        self.assertEqual(b.tellbits(), 8)
+    def align(self) -> None:
+        """Pad with zero bits up to the next byte boundary."""
+        if self.bits:
+            self.writebits(0, 8 - self.bits)
+
+    def tellbits(self) -> int:
+        """Return the number of bits written so far."""
+        return (len(self.data) << 3) + self.bits
 
+    def getvalue(self) -> bytes:
+        """Return the bytes written so far, the last one zero-padded."""
+        self.align()
+        return bytes(self.data)
 
-if __name__ == "__main__":  # pragma: no cover
-    logging.basicConfig(level=logging.DEBUG)
-    unittest.main()  # pragma: no cover
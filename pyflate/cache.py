@@ -0,0 +1,132 @@
+"""
+Content-addressed LRU cache of decompressed results. Entries are keyed on a
+BLAKE2b hash of the compressed bytes together with the gzip footer (CRC32
+and ISIZE), so a repeated payload is answered without decoding at all. The
+cache keeps the decompressed results within a memory budget, evicting the
+least recently used ones, and can spill evicted results to a local
+directory instead of dropping them.
+"""
+
+import collections
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import typing as T
+
+from pyflate import gzip_main
+from pyflate.limits import Limits
+
+
+class DecompressCache:
+    """Opt-in cache in front of gzip_main(). Safe to share between
+    threads."""
+
+    def __init__(self, max_bytes: int, spill_dir: T.Optional[str] = None) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.entries: T.OrderedDict[str, bytes] = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        """Return the cache key of a compressed payload."""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return digest + data[-8:].hex()
+
+    def decompress(self, data: bytes, limits: T.Optional[Limits] = None) -> bytes:
+        """Return the decompressed payload, decoding it only on a miss.
+        Hits are checked against the output and ratio limits as well."""
+        key = self.key(data)
+        with self.lock:
+            out = self.entries.get(key)
+            if out is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if out is not None:
+            if limits is not None:
+                limits.check_output(len(data), len(out))
+            return out
+        out = self._load_spilled(key)
+        if out is not None:
+            with self.lock:
+                self.spill_hits += 1
+            if limits is not None:
+                limits.check_output(len(data), len(out))
+        else:
+            out = gzip_main(io.BytesIO(data), limits)
+            with self.lock:
+                self.misses += 1
+        self._put(key, out)
+        return out
+
+    def gzip_main(self, f: T.BinaryIO, limits: T.Optional[Limits] = None) -> bytes:
+        return self.decompress(f.read(), limits)
+
+    def _put(self, key: str, out: bytes) -> None:
+        spill = []
+        with self.lock:
+            if key in self.entries:
+                return
+            if len(out) > self.max_bytes:
+                spill.append((key, out))
+            else:
+                self.entries[key] = out
+                self.size += len(out)
+                while self.size > self.max_bytes:
+                    evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted[1])
+                    self.evictions += 1
+                    spill.append(evicted)
+        for evicted in spill:
+            self._spill(*evicted)
+
+    def _spill_path(self, key: str) -> str:
+        assert self.spill_dir is not None
+        return os.path.join(self.spill_dir, key)
+
+    def _spill(self, key: str, out: bytes) -> None:
+        if self.spill_dir is None:
+            return
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        # write to a temporary file first so readers never see a partial one
+        fd, tmp = tempfile.mkstemp(dir=self.spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp, path)
+
+    def _load_spilled(self, key: str) -> T.Optional[bytes]:
+        if self.spill_dir is None:
+            return None
+        try:
+            with open(self._spill_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def stats(self) -> T.Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
+
+    def clear(self) -> None:
+        """Drop the in-memory entries. Spilled entries are kept."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -0,0 +1,109 @@
+"""
+Decoder checkpoints. When the input of a Decoder runs out in the middle of
+a stream, it records where it was as a Checkpoint: the bit position of the
+last complete symbol, block or member, the Huffman code lengths of the
+current block, the window and the running CRC and size of the member.
+Decoder.resume() carries on from a checkpoint once more input is there, so
+a file that is still being written is decoded once, however often it is
+polled. Checkpoints serialize to a compact blob.
+"""
+
+from __future__ import annotations
+
+import zlib
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+
+# Where a checkpoint resumes decoding: at a gzip member header, at a block
+# header, at a symbol within a Huffman block, or at the member footer.
+MEMBER, BLOCK, SYMBOL, FOOTER = range(4)
+
+MAGIC = b"PFC1"
+# struct is imported by the methods using it: decoding does not need it
+HEADER_FORMAT = "<4sBBBQIQQHH"
+
+
+class Checkpoint:
+    """Resumable decoder state."""
+
+    def __init__(
+        self,
+        state: int = MEMBER,
+        position: int = 0,
+        lastbit: int = 0,
+        blocktype: int = 0,
+        literal_lengths: T.Sequence[int] = (),
+        distance_lengths: T.Sequence[int] = (),
+        window: bytes = b"",
+        crc: int = 0,
+        size: int = 0,
+        output: int = 0,
+    ) -> None:
+        self.state = state
+        self.position = position  # bit offset in the input
+        # for SYMBOL: the block being decoded and its dynamic code lengths
+        self.lastbit = lastbit
+        self.blocktype = blocktype
+        self.literal_lengths = bytes(literal_lengths)
+        self.distance_lengths = bytes(distance_lengths)
+        self.window = bytes(window)  # last output of the member, up to 32 KiB
+        self.crc = crc  # running CRC32 of the member
+        self.size = size  # bytes of output of the member
+        self.output = output  # bytes of output of the whole stream
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Checkpoint) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        state = ["MEMBER", "BLOCK", "SYMBOL", "FOOTER"][self.state]
+        return f"Checkpoint({state} @{self.position}, output={self.output})"
+
+    def to_bytes(self) -> bytes:
+        import struct
+
+        header = struct.pack(
+            HEADER_FORMAT,
+            MAGIC,
+            self.state,
+            self.lastbit,
+            self.blocktype,
+            self.position,
+            self.crc,
+            self.size,
+            self.output,
+            len(self.literal_lengths),
+            len(self.distance_lengths),
+        )
+        return (
+            header
+            + self.literal_lengths
+            + self.distance_lengths
+            + zlib.compress(self.window, 1)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Checkpoint:
+        import struct
+
+        if data[:4] != MAGIC:
+            raise Exception("not a pyflate checkpoint: " + repr(data[:4]))
+        (_, state, lastbit, blocktype, position, crc, size, output, nlit, ndist) = (
+            struct.unpack_from(HEADER_FORMAT, data)
+        )
+        start = struct.calcsize(HEADER_FORMAT)
+        lengths = data[start : start + nlit + ndist]
+        window = zlib.decompress(data[start + nlit + ndist :])
+        return cls(
+            state,
+            position,
+            lastbit,
+            blocktype,
+            lengths[:nlit],
+            lengths[nlit:],
+            window,
+            crc,
+            size,
+            output,
+        )
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Corpus regression runner. Every input of a corpus (such as the AFL queue/
+directory) is decoded with pyflate in a process pool and the result is
+compared with gzip.decompress(). Inputs that disagree, or that exceed the
+per-input time or memory budget, are flagged, and a report ranking the
+slowest inputs is written so that timings can be compared between releases.
+
+Usage: python -m pyflate.corpus [options] <directory or file>...
+"""
+
+import argparse
+import gzip
+import io
+import multiprocessing
+import pathlib
+import resource
+import signal
+import sys
+import time
+import typing as T
+
+from pyflate import gzip_main
+
+# Outcomes where pyflate and gzip agree. Anything else is flagged.
+OK = "ok"  # both decoded the input to the same output
+REJECTED = "rejected"  # both rejected the input
+# Flagged outcomes.
+MISMATCH = "mismatch"  # both decoded the input, to different outputs
+ERROR = "error"  # pyflate rejected an input that gzip decoded
+ACCEPTED = "accepted"  # pyflate decoded an input that gzip rejected
+TIMEOUT = "timeout"  # pyflate exceeded the time budget
+MEMORY = "memory"  # pyflate exceeded the memory budget
+
+AGREEING = (OK, REJECTED)
+
+
+class CorpusResult(T.NamedTuple):
+    path: str
+    status: str
+    seconds: float
+    input_size: int
+    output_size: int
+    error: str
+
+    @property
+    def flagged(self) -> bool:
+        return self.status not in AGREEING
+
+
+class BudgetExceeded(Exception):
+    """Raised in a worker when an input exceeds its time budget."""
+
+
+def _alarm(signum: int, frame: T.Any) -> None:
+    raise BudgetExceeded()
+
+
+def _init_worker(memory_budget: int) -> None:
+    """Pool initializer: install the time budget handler and cap the
+    address space of the worker, so that a runaway input raises
+    MemoryError instead of taking the machine down."""
+    signal.signal(signal.SIGALRM, _alarm)
+    if memory_budget:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (memory_budget, hard))
+
+
+def check_file(path: str, time_budget: float = 0) -> CorpusResult:
+    """Decode a single input with both pyflate and gzip and compare."""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        expected: T.Optional[bytes] = gzip.decompress(data)
+    except Exception:
+        expected = None
+
+    out: T.Optional[bytes] = None
+    error = ""
+    start = time.perf_counter()
+    if time_budget:
+        signal.setitimer(signal.ITIMER_REAL, time_budget)
+    try:
+        out = gzip_main(io.BytesIO(data))
+    except BudgetExceeded:
+        error = TIMEOUT
+    except MemoryError:
+        error = MEMORY
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    seconds = time.perf_counter() - start
+
+    if error in (TIMEOUT, MEMORY):
+        status = error
+    elif out is None:
+        status = REJECTED if expected is None else ERROR
+    elif expected is None:
+        status = ACCEPTED
+    else:
+        status = OK if out == expected else MISMATCH
+    size = len(out) if out is not None else 0
+    return CorpusResult(path, status, seconds, len(data), size, error)
+
+
+def _check_file(args: T.Tuple[str, float]) -> CorpusResult:
+    return check_file(*args)
+
+
+def corpus_files(paths: T.Iterable[str]) -> T.List[str]:
+    """Expand directories to the (non-hidden) files they contain."""
+    ret = []
+    for path in map(pathlib.Path, paths):
+        if path.is_dir():
+            ret += sorted(
+                str(p)
+                for p in path.iterdir()
+                if p.is_file() and not p.name.startswith(".")
+            )
+        else:
+            ret.append(str(path))
+    return ret
+
+
+def run_corpus(
+    paths: T.Iterable[str],
+    processes: T.Optional[int] = None,
+    time_budget: float = 5.0,
+    memory_budget: int = 1 << 30,
+) -> T.List[CorpusResult]:
+    """Check every input across a pool of processes. time_budget is in
+    seconds and memory_budget in bytes of address space per worker; zero
+    disables the respective budget."""
+    files = corpus_files(paths)
+    with multiprocessing.Pool(
+        processes, _init_worker, (memory_budget,), maxtasksperchild=1000
+    ) as pool:
+        return pool.map(
+            _check_file, [(fp, time_budget) for fp in files], chunksize=4
+        )
+
+
+def write_report(
+    results: T.Sequence[CorpusResult], f: T.TextIO, top: int = 50
+) -> None:
+    """Write a summary and the slowest inputs, ranked, as tab-separated
+    values."""
+    counts: T.Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    total = sum(result.seconds for result in results)
+    f.write(f"# inputs: {len(results)}, total seconds: {total:.3f}\n")
+    f.write("# " + ", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+    f.write("\n")
+    f.write("rank\tseconds\tstatus\tinput_size\toutput_size\tpath\terror\n")
+    ranked = sorted(results, key=lambda r: r.seconds, reverse=True)
+    # the slowest inputs, followed by any flagged input not among them
+    rows = [(str(rank), r) for rank, r in enumerate(ranked[:top], 1)]
+    rows += [("-", r) for r in ranked[top:] if r.flagged]
+    for rank, r in rows:
+        f.write(
+            f"{rank}\t{r.seconds:.6f}\t{r.status}\t{r.input_size}\t"
+            f"{r.output_size}\t{r.path}\t{r.error}\n"
+        )
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Decode a corpus with pyflate and compare with gzip."
+    )
+    parser.add_argument("paths", nargs="+", help="corpus files or directories")
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    parser.add_argument(
+        "--time-budget", type=float, default=5.0, help="seconds per input"
+    )
+    parser.add_argument(
+        "--memory-budget", type=int, default=1024, help="MiB per worker"
+    )
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("-o", "--report", help="report file (default: stdout)")
+    args = parser.parse_args()
+
+    results = run_corpus(
+        args.paths, args.jobs, args.time_budget, args.memory_budget << 20
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            write_report(results, f, args.top)
+    else:
+        write_report(results, sys.stdout, args.top)
+    sys.exit(1 if any(r.flagged for r in results) else 0)
+
+
+if __name__ == "__main__":
+    _main()
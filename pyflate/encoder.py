@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+"""
+Pure-Python DEFLATE encoder writing seekable gzip in the BGZF layout used by
+bgzip/samtools. The input is cut into blocks of at most BLOCK_SIZE bytes,
+and every block becomes an independent gzip member. Each member records its
+own compressed size in a BC (BSIZE) FEXTRA subfield, so a reader can jump
+from member to member without decoding, and can decode them in parallel.
+
+Each block is compressed with a hash-chain LZ77 matcher. Then whichever of
+fixed Huffman, dynamic Huffman or stored encoding comes out smallest is
+written. The stored fallback guarantees that every member fits the 16-bit
+BSIZE field.
+
+An index of (compressed offset, uncompressed offset) pairs, one per member,
+can be written next to the output. It uses the .gzi format of bgzip.
+
+Usage: python -m pyflate.encoder <filename>
+"""
+
+import bisect
+import heapq
+import io
+import struct
+import sys
+import typing as T
+import zlib
+
+from pyflate import (
+    code_length_orders,
+    distance_base,
+    extra_distance_bits,
+    extra_length_bits,
+    length_base,
+)
+from pyflate.bit import BitWriter
+from pyflate.huffman import reverse_bits
+
+# Uncompressed bytes per member. Like bgzip, this leaves enough room for
+# the header, footer and stored-block overhead below the 64 KiB BSIZE limit.
+BLOCK_SIZE = 0xFF00
+MAX_MEMBER_SIZE = 0x10000
+
+MIN_MATCH = 3
+MAX_MATCH = 258
+MAX_DISTANCE = 32768
+MAX_CHAIN = 64
+
+# The empty member bgzip appends to mark the end of the file.
+BGZF_EOF = bytes.fromhex(
+    "1f8b08040000000000ff0600424302001b0003000000000000000000"
+)
+
+# A token is either a literal byte or a (length, distance) match.
+Token = T.Union[int, T.Tuple[int, int]]
+
+LENGTH_CODES = list(range(257, 286))
+LENGTH_BASES = [length_base(code) for code in LENGTH_CODES]
+DISTANCE_BASES = [distance_base(code) for code in range(30)]
+
+
+def length_code(length: int) -> T.Tuple[int, int, int]:
+    """Return (symbol, extra bit count, extra bits) encoding a length."""
+    if length == MAX_MATCH:
+        return 285, 0, 0
+    i = bisect.bisect_right(LENGTH_BASES, length) - 1
+    code = LENGTH_CODES[i]
+    return code, extra_length_bits(code), length - LENGTH_BASES[i]
+
+
+def distance_code(distance: int) -> T.Tuple[int, int, int]:
+    """Return (symbol, extra bit count, extra bits) encoding a distance."""
+    code = bisect.bisect_right(DISTANCE_BASES, distance) - 1
+    return code, extra_distance_bits(code), distance - DISTANCE_BASES[code]
+
+
+def lz77(data: bytes, max_chain: int = MAX_CHAIN) -> T.List[Token]:
+    """Greedy LZ77 parse of data using hash chains over 3-byte prefixes."""
+    n = len(data)
+    head: T.Dict[bytes, int] = {}
+    prev = [-1] * n
+    tokens: T.List[Token] = []
+    i = 0
+    while i < n:
+        best_length = best_distance = 0
+        if i + MIN_MATCH <= n:
+            key = data[i : i + MIN_MATCH]
+            limit = min(MAX_MATCH, n - i)
+            candidate = head.get(key, -1)
+            chain = max_chain
+            while candidate >= 0 and i - candidate <= MAX_DISTANCE and chain:
+                # cheap rejection before measuring the whole match
+                if data[candidate + best_length] == data[i + best_length]:
+                    length = 0
+                    while (
+                        length < limit
+                        and data[candidate + length] == data[i + length]
+                    ):
+                        length += 1
+                    if length > best_length:
+                        best_length, best_distance = length, i - candidate
+                        if length == limit:
+                            break
+                candidate = prev[candidate]
+                chain -= 1
+            prev[i] = head.get(key, -1)
+            head[key] = i
+        if best_length >= MIN_MATCH:
+            tokens.append((best_length, best_distance))
+            # index the positions covered by the match too
+            for j in range(i + 1, min(i + best_length, n - MIN_MATCH + 1)):
+                key = data[j : j + MIN_MATCH]
+                prev[j] = head.get(key, -1)
+                head[key] = j
+            i += best_length
+        else:
+            tokens.append(data[i])
+            i += 1
+    return tokens
+
+
+def huffman_lengths(freqs: T.List[int], max_bits: int) -> T.List[int]:
+    """Return Huffman code lengths for the frequencies, none longer than
+    max_bits. Symbols with zero frequency get no code. If the tree is too
+    deep, the frequencies are flattened until it fits."""
+    while True:
+        lengths = [0] * len(freqs)
+        heap = [(f, [sym]) for sym, f in enumerate(freqs) if f]
+        if len(heap) == 1:
+            lengths[heap[0][1][0]] = 1
+            return lengths
+        heapq.heapify(heap)
+        while len(heap) > 1:
+            f1, syms1 = heapq.heappop(heap)
+            f2, syms2 = heapq.heappop(heap)
+            for sym in syms1 + syms2:
+                lengths[sym] += 1
+            heapq.heappush(heap, (f1 + f2, syms1 + syms2))
+        if max(lengths) <= max_bits:
+            return lengths
+        freqs = [(f + 1) >> 1 for f in freqs]
+
+
+def canonical_codes(lengths: T.List[int]) -> T.List[int]:
+    """Assign canonical codes (RFC 1951, 3.2.2) to the code lengths. The
+    codes are returned bit-reversed, ready for BitWriter.writebits()."""
+    max_bits = max(lengths, default=0)
+    bl_count = [0] * (max_bits + 1)
+    for length in lengths:
+        if length:
+            bl_count[length] += 1
+    code = 0
+    next_code = [0] * (max_bits + 1)
+    for bits in range(1, max_bits + 1):
+        code = (code + bl_count[bits - 1]) << 1
+        next_code[bits] = code
+    codes = [0] * len(lengths)
+    for sym, length in enumerate(lengths):
+        if length:
+            codes[sym] = reverse_bits(next_code[length], length)
+            next_code[length] += 1
+    return codes
+
+
+FIXED_LITERAL_LENGTHS = [8] * 144 + [9] * 112 + [7] * 24 + [8] * 8
+FIXED_DISTANCE_LENGTHS = [5] * 30
+
+
+def run_length_encode(lengths: T.List[int]) -> T.List[T.Tuple[int, int, int]]:
+    """Encode code lengths with the repeat symbols 16, 17 and 18. Return
+    (symbol, extra bit count, extra bits) triples."""
+    ret = []
+    i, n = 0, len(lengths)
+    while i < n:
+        length = lengths[i]
+        run = 1
+        while i + run < n and lengths[i + run] == length:
+            run += 1
+        i += run
+        if length == 0:
+            while run >= 11:
+                r = min(run, 138)
+                ret.append((18, 7, r - 11))
+                run -= r
+            if run >= 3:
+                ret.append((17, 3, run - 3))
+                run = 0
+        else:
+            ret.append((length, 0, 0))
+            run -= 1
+            while run >= 3:
+                r = min(run, 6)
+                ret.append((16, 2, r - 3))
+                run -= r
+        ret += [(length, 0, 0)] * run
+    return ret
+
+
+class _Block:
+    """Symbol statistics of one block of tokens."""
+
+    def __init__(self, tokens: T.List[Token]) -> None:
+        self.tokens = tokens
+        self.literal_freqs = [0] * 286
+        self.distance_freqs = [0] * 30
+        self.extra_bits = 0
+        for token in tokens:
+            if isinstance(token, int):
+                self.literal_freqs[token] += 1
+            else:
+                code, extra, _ = length_code(token[0])
+                self.literal_freqs[code] += 1
+                self.extra_bits += extra
+                code, extra, _ = distance_code(token[1])
+                self.distance_freqs[code] += 1
+                self.extra_bits += extra
+        self.literal_freqs[256] = 1
+
+    def cost(self, literal_lengths: T.List[int], distance_lengths: T.List[int]) -> int:
+        """Return the size in bits of the block's symbols with these codes."""
+        return (
+            sum(f * l for f, l in zip(self.literal_freqs, literal_lengths))
+            + sum(f * l for f, l in zip(self.distance_freqs, distance_lengths))
+            + self.extra_bits
+        )
+
+
+def _write_symbols(
+    w: BitWriter,
+    tokens: T.List[Token],
+    literal_lengths: T.List[int],
+    distance_lengths: T.List[int],
+) -> None:
+    literal_codes = canonical_codes(literal_lengths)
+    distance_codes = canonical_codes(distance_lengths)
+    for token in tokens:
+        if isinstance(token, int):
+            w.writebits(literal_codes[token], literal_lengths[token])
+            continue
+        code, extra, value = length_code(token[0])
+        w.writebits(literal_codes[code], literal_lengths[code])
+        w.writebits(value, extra)
+        code, extra, value = distance_code(token[1])
+        w.writebits(distance_codes[code], distance_lengths[code])
+        w.writebits(value, extra)
+    w.writebits(literal_codes[256], literal_lengths[256])
+
+
+def _dynamic_header(
+    literal_lengths: T.List[int], distance_lengths: T.List[int]
+) -> T.Tuple[T.List[T.Tuple[int, int]], int]:
+    """Return the (value, bit count) fields of a dynamic block header, and
+    their total size in bits."""
+    literals = max(257, max(i for i, l in enumerate(literal_lengths) if l) + 1)
+    distances = max(
+        (i + 1 for i, l in enumerate(distance_lengths) if l), default=1
+    )
+    rle = run_length_encode(
+        literal_lengths[:literals] + distance_lengths[:distances]
+    )
+    freqs = [0] * 19
+    for sym, _, _ in rle:
+        freqs[sym] += 1
+    cl_lengths = huffman_lengths(freqs, 7)
+    cl_codes = canonical_codes(cl_lengths)
+    order = [code_length_orders(i) for i in range(19)]
+    cl_count = 19
+    while cl_count > 4 and not cl_lengths[order[cl_count - 1]]:
+        cl_count -= 1
+
+    fields = [(literals - 257, 5), (distances - 1, 5), (cl_count - 4, 4)]
+    fields += [(cl_lengths[order[i]], 3) for i in range(cl_count)]
+    for sym, extra, value in rle:
+        fields.append((cl_codes[sym], cl_lengths[sym]))
+        if extra:
+            fields.append((value, extra))
+    return fields, sum(bits for _, bits in fields)
+
+
+def deflate(data: bytes, max_chain: int = MAX_CHAIN) -> bytes:
+    """Compress data into a raw DEFLATE stream made of a single final
+    block: stored, fixed or dynamic Huffman, whichever is smallest."""
+    w = BitWriter()
+    if not data:
+        w.writebits(1, 1)
+        w.writebits(1, 2)
+        w.writebits(0, 7)  # end of block in the fixed code
+        return w.getvalue()
+
+    block = _Block(lz77(data, max_chain))
+    fixed = block.cost(FIXED_LITERAL_LENGTHS, FIXED_DISTANCE_LENGTHS)
+
+    # every alphabet gets at least two codes, so that both are complete
+    literal_freqs = list(block.literal_freqs)
+    if sum(1 for f in literal_freqs if f) < 2:
+        literal_freqs[0] += 1
+    distance_freqs = list(block.distance_freqs)
+    for i in range(2):
+        if sum(1 for f in distance_freqs if f) < 2 and not distance_freqs[i]:
+            distance_freqs[i] = 1
+    literal_lengths = huffman_lengths(literal_freqs, 15)
+    distance_lengths = huffman_lengths(distance_freqs, 15)
+    header, header_bits = _dynamic_header(literal_lengths, distance_lengths)
+    dynamic = header_bits + block.cost(literal_lengths, distance_lengths)
+
+    stored = 8 * (len(data) + 5 * (1 + len(data) // 0xFFFF))
+    if stored < min(fixed, dynamic):
+        return _stored(data)
+
+    if dynamic < fixed:
+        w.writebits(1, 1)
+        w.writebits(2, 2)
+        for value, bits in header:
+            w.writebits(value, bits)
+        _write_symbols(w, block.tokens, literal_lengths, distance_lengths)
+    else:
+        w.writebits(1, 1)
+        w.writebits(1, 2)
+        _write_symbols(
+            w, block.tokens, FIXED_LITERAL_LENGTHS, FIXED_DISTANCE_LENGTHS
+        )
+    return w.getvalue()
+
+
+def _stored(data: bytes) -> bytes:
+    """Encode data as a sequence of stored blocks."""
+    ret = bytearray()
+    for i in range(0, len(data), 0xFFFF):
+        chunk = data[i : i + 0xFFFF]
+        last = i + 0xFFFF >= len(data)
+        ret += struct.pack("<BHH", last, len(chunk), len(chunk) ^ 0xFFFF)
+        ret += chunk
+    return bytes(ret)
+
+
+def compress_member(data: bytes, max_chain: int = MAX_CHAIN) -> bytes:
+    """Compress up to BLOCK_SIZE bytes into one BGZF gzip member."""
+    if len(data) > BLOCK_SIZE:
+        raise Exception("BGZF block too large: " + repr(len(data)))
+    body = deflate(data, max_chain)
+    size = 18 + len(body) + 8
+    assert size <= MAX_MEMBER_SIZE
+    header = struct.pack(
+        "<BBBBIBBHBBHH",
+        0x1F, 0x8B, 8, 0x04,  # magic, DEFLATE, FEXTRA
+        0, 0, 0xFF,  # mtime, extra flags, unknown OS
+        6, ord("B"), ord("C"), 2, size - 1,  # XLEN, BC subfield, BSIZE
+    )
+    footer = struct.pack("<II", zlib.crc32(data), len(data))
+    return header + body + footer
+
+
+class BgzfWriter:
+    """File-like writer of seekable gzip. Every member is recorded in
+    index as (compressed offset, uncompressed offset)."""
+
+    def __init__(
+        self,
+        f: T.BinaryIO,
+        block_size: int = BLOCK_SIZE,
+        max_chain: int = MAX_CHAIN,
+    ) -> None:
+        self.f = f
+        self.block_size = min(block_size, BLOCK_SIZE)
+        self.max_chain = max_chain
+        self.buffer = bytearray()
+        self.index: T.List[T.Tuple[int, int]] = []
+        self.compressed_offset = 0
+        self.uncompressed_offset = 0
+
+    def write(self, data: bytes) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self._write_member(bytes(self.buffer[: self.block_size]))
+            del self.buffer[: self.block_size]
+        return len(data)
+
+    def flush(self) -> None:
+        """End the current member early, making everything written so far
+        readable."""
+        if self.buffer:
+            self._write_member(bytes(self.buffer))
+            self.buffer.clear()
+        self.f.flush()
+
+    def close(self) -> None:
+        """Write the remaining data and the BGZF end-of-file marker."""
+        self.flush()
+        self.f.write(BGZF_EOF)
+        self.compressed_offset += len(BGZF_EOF)
+
+    def _write_member(self, data: bytes) -> None:
+        member = compress_member(data, self.max_chain)
+        self.index.append((self.compressed_offset, self.uncompressed_offset))
+        self.f.write(member)
+        self.compressed_offset += len(member)
+        self.uncompressed_offset += len(data)
+
+    def write_index(self, f: T.BinaryIO) -> None:
+        write_index(f, self.index)
+
+    def __enter__(self) -> "BgzfWriter":
+        return self
+
+    def __exit__(self, *exc: T.Any) -> None:
+        self.close()
+
+
+def write_index(f: T.BinaryIO, index: T.List[T.Tuple[int, int]]) -> None:
+    """Write a .gzi index: the number of entries followed by (compressed
+    offset, uncompressed offset) pairs, as little-endian uint64. Like
+    bgzip, the implicit (0, 0) entry of the first member is left out."""
+    entries = [entry for entry in index if entry != (0, 0)]
+    f.write(struct.pack("<Q", len(entries)))
+    for entry in entries:
+        f.write(struct.pack("<QQ", *entry))
+
+
+def read_index(f: T.BinaryIO) -> T.List[T.Tuple[int, int]]:
+    """Read a .gzi index, including the implicit (0, 0) entry."""
+    (count,) = struct.unpack("<Q", f.read(8))
+    data = f.read(16 * count)
+    return [(0, 0)] + [
+        struct.unpack_from("<QQ", data, 16 * i) for i in range(count)
+    ]
+
+
+def compress(data: bytes, max_chain: int = MAX_CHAIN) -> bytes:
+    """Compress data into seekable gzip, including the EOF marker."""
+    f = io.BytesIO()
+    with BgzfWriter(f, max_chain=max_chain) as w:
+        w.write(data)
+    return f.getvalue()
+
+
+def _main() -> None:
+    filename = sys.argv[1]
+    with open(filename, "rb") as inp, open(filename + ".gz", "wb") as out:
+        w = BgzfWriter(out)
+        while True:
+            data = inp.read(BLOCK_SIZE)
+            if not data:
+                break
+            w.write(data)
+        w.close()
+    with open(filename + ".gz.gzi", "wb") as f:
+        w.write_index(f)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        program = sys.argv[0]
+        print("usage:", program, "<filename>")
+        print(
+            "\tWrites seekable gzip to <filename>.gz and its index to "
+            "<filename>.gz.gzi."
+        )
+        sys.exit(1)
+
+    _main()
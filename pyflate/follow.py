@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Follow a gzip file that is still being written, like tail -f. Every poll
+resumes decoding from the checkpoint the previous one left behind, so it
+only costs the bytes appended since. The checkpoint can be kept in a state
+file, so following survives restarts.
+
+Usage: python -m pyflate.follow [-s <state file>] [-i <seconds>] [--once] <filename.gz>
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import typing as T
+
+from pyflate import Decoder
+from pyflate.bit import LengthError
+from pyflate.checkpoint import Checkpoint
+from pyflate.log import null_tracer
+
+
+class Follower:
+    """Incremental decoder of the gzip file at path."""
+
+    def __init__(self, path: str, checkpoint: T.Optional[Checkpoint] = None) -> None:
+        self.path = path
+        self.decoder = Decoder(tracer=null_tracer)
+        self.checkpoint = checkpoint or Checkpoint()
+
+    def poll(self) -> T.Iterator[bytes]:
+        """Yield the output decoded from what was appended since the last
+        poll."""
+        with open(self.path, "rb") as f:
+            try:
+                yield from self.decoder.resume(f, self.checkpoint)
+            except LengthError:
+                pass  # the rest has not been written yet
+            self.checkpoint = self.decoder.checkpoint
+
+    def follow(self, interval: float = 1.0) -> T.Iterator[bytes]:
+        """Poll forever, every interval seconds."""
+        while True:
+            yield from self.poll()
+            time.sleep(interval)
+
+
+def load_state(path: str) -> T.Optional[Checkpoint]:
+    try:
+        with open(path, "rb") as f:
+            return Checkpoint.from_bytes(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def save_state(path: str, checkpoint: Checkpoint) -> None:
+    # write to a temporary file first so a crash never leaves a partial one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, "wb") as f:
+        f.write(checkpoint.to_bytes())
+    os.replace(tmp, path)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write what is appended to a gzip file to standard output."
+    )
+    parser.add_argument("filename")
+    parser.add_argument("-s", "--state", help="file keeping the checkpoint")
+    parser.add_argument("-i", "--interval", type=float, default=1.0)
+    parser.add_argument("--once", action="store_true", help="poll only once")
+    args = parser.parse_args()
+    checkpoint = load_state(args.state) if args.state else None
+    follower = Follower(args.filename, checkpoint)
+    out = sys.stdout.buffer
+    while True:
+        for chunk in follower.poll():
+            out.write(chunk)
+        out.flush()
+        if args.state:
+            save_state(args.state, follower.checkpoint)
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    _main()
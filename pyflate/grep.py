@@ -0,0 +1,173 @@
+"""
+Streaming search over compressed data, like zgrep. Lines of the
+decompressed stream are matched against a literal or regular expression
+pattern as it is decoded, and decoding stops as soon as enough matches have
+been found. The output is never materialized: besides the decoder's window
+and the chunk being searched, only the line straddling the chunk boundary is
+kept, and no more than MAX_LINE bytes of it.
+
+Usage: python -m pyflate grep [-F] [-i] [-n] [-b] [-m NUM] PATTERN file.gz
+"""
+
+import argparse
+import itertools
+import re
+import sys
+import typing as T
+
+from pyflate import Decoder
+from pyflate.log import null_tracer
+
+# Bytes of a line kept for matching. Longer lines are cut to their first
+# MAX_LINE bytes, which bounds the memory taken by input without newlines.
+MAX_LINE = 1 << 20
+
+
+class GrepMatch(T.NamedTuple):
+    line_number: int  # counted from 1
+    line_offset: int  # uncompressed offset of the start of the line
+    match_offset: int  # uncompressed offset of the match
+    line: bytes  # without its newline
+
+
+def _finder(
+    pattern: bytes, fixed: bool, ignore_case: bool
+) -> T.Callable[[bytes, int, int], int]:
+    """Return a function finding pattern in buf[pos:end], returning its
+    position or -1."""
+    if fixed and not ignore_case:
+        return lambda buf, pos, end: buf.find(pattern, pos, end)
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    regex = re.compile(re.escape(pattern) if fixed else pattern, flags)
+
+    def find(buf: bytes, pos: int, end: int) -> int:
+        while pos < end:
+            m = regex.search(buf, pos, end)
+            if m is None:
+                return -1
+            line_end = buf.find(b"\n", m.start(), m.end())
+            if line_end < 0:
+                return m.start()
+            # The match runs into the next line, through \s, [^x] or the
+            # like. Lines are matched on their own: try the rest of this one.
+            m = regex.search(buf, m.start(), line_end)
+            if m is not None:
+                return m.start()
+            pos = line_end + 1
+        return -1
+
+    return find
+
+
+def search_chunks(
+    chunks: T.Iterable[bytes],
+    pattern: bytes,
+    fixed: bool = False,
+    ignore_case: bool = False,
+    max_count: int = 0,
+) -> T.Iterator[GrepMatch]:
+    """Yield the lines of the concatenated chunks that match pattern, a
+    regular expression unless fixed. A line is reported once however many
+    times it matches. Stop after max_count matching lines, if not zero.
+    Lines longer than MAX_LINE bytes are matched and reported cut to their
+    first MAX_LINE bytes."""
+    find = _finder(pattern, fixed, ignore_case)
+    count = 0
+    line_number = 1  # of the first line in buf
+    base = 0  # uncompressed offset of buf
+    # The incomplete last line so far, in pieces that are only joined once
+    # a chunk ends the line, so that a long line is not copied per chunk.
+    pending: T.List[bytes] = []
+    kept = 0  # bytes in pending
+    cut = 0  # bytes of the line past MAX_LINE, dropped
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:  # end of the stream, pending is the last line
+            buf = b"".join(pending)
+            end = len(buf)
+        else:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                if cut:
+                    cut += len(chunk)
+                else:
+                    pending.append(chunk)
+                    kept += len(chunk)
+                    if kept > MAX_LINE:
+                        line = b"".join(pending)
+                        pending, cut = [line[:MAX_LINE]], kept - MAX_LINE
+                        kept = MAX_LINE
+                continue
+            if cut:
+                cut += newline
+                chunk = chunk[newline:]
+            pending.append(chunk)
+            buf = b"".join(pending)
+            end = buf.rfind(b"\n") + 1
+        pos = counted = 0
+        while pos < end:
+            m = find(buf, pos, end)
+            if m < 0:
+                break
+            line_start = buf.rfind(b"\n", 0, m) + 1
+            line_end = buf.find(b"\n", m, end)
+            if line_end < 0:
+                line_end = end
+            line_number += buf.count(b"\n", counted, line_start)
+            counted = line_start
+            # only the first line of buf, the pending one, can have been cut
+            shift = base + (cut if line_start else 0)
+            yield GrepMatch(
+                line_number, shift + line_start, shift + m, buf[line_start:line_end]
+            )
+            count += 1
+            if count == max_count:
+                return
+            pos = line_end + 1
+        line_number += buf.count(b"\n", counted, end)
+        base += end + cut
+        pending, kept, cut = [buf[end:]], len(buf) - end, 0
+
+
+def grep(
+    f: T.BinaryIO,
+    pattern: bytes,
+    fixed: bool = False,
+    ignore_case: bool = False,
+    max_count: int = 0,
+) -> T.Iterator[GrepMatch]:
+    """Search the gzip stream in f, see search_chunks()."""
+    chunks = Decoder(tracer=null_tracer).chunks(f)
+    try:
+        yield from search_chunks(chunks, pattern, fixed, ignore_case, max_count)
+    finally:
+        chunks.close()
+
+
+def _main(argv: T.List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m pyflate grep",
+        description="Print the lines of a gzip file matching a pattern.",
+    )
+    parser.add_argument("pattern")
+    parser.add_argument("filename")
+    parser.add_argument("-F", "--fixed-strings", action="store_true")
+    parser.add_argument("-i", "--ignore-case", action="store_true")
+    parser.add_argument("-n", "--line-number", action="store_true")
+    parser.add_argument("-b", "--byte-offset", action="store_true")
+    parser.add_argument("-m", "--max-count", type=int, default=0)
+    args = parser.parse_args(argv)
+    pattern = args.pattern.encode("utf-8", "surrogateescape")
+    out = sys.stdout.buffer
+    found = False
+    with open(args.filename, "rb") as f:
+        for match in grep(
+            f, pattern, args.fixed_strings, args.ignore_case, args.max_count
+        ):
+            found = True
+            if args.line_number:
+                out.write(b"%d:" % match.line_number)
+            if args.byte_offset:
+                out.write(b"%d:" % match.line_offset)
+            out.write(match.line + b"\n")
+    # like grep(1): 0 if a line matched, 1 otherwise
+    return 0 if found else 1
@@ -9,11 +9,34 @@
 # This is probably most useful for research purposes/index building;  there
 # is certainly some room for improvement in the Huffman bit-matcher.
 
-import typing as T
-from pprint import pformat
+from __future__ import annotations
 
-from pyflate.bit import Bitfield
-from pyflate.log import log
+import _thread
+
+from pyflate.bit import Bitfield, LengthError
+from pyflate.log import log_tracer
+
+# Symbols a block has to decode before generating a specialized decoder for
+# its tables pays off, as measured by bench_codegen.py.
+CODEGEN_THRESHOLD = 200
+
+# Primary lookup tables of specialized decoders are made just wide enough to
+# decode this fraction of the symbols in one lookup, and no wider than
+# MAX_PRIMARY_WIDTH bits, like the 9 bit primary table of zlib's inflate.
+PRIMARY_COVERAGE = 0.99
+MAX_PRIMARY_WIDTH = 10
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+    from pyflate.log import T_TRACER
+
+# Specialized decoders already generated, by code lengths, tracing and
+# primary table width. Shared by all decoders, hence the lock; _thread is
+# used because importing threading would slow down start-up.
+_specialized: T.Dict[T.Tuple[T.Any, bool, int], T.Callable[..., int]] = {}
+_specialized_lock = _thread.allocate_lock()
+_SPECIALIZED_MAX = 64
 
 
 class HuffmanLength:
@@ -94,7 +117,9 @@ class HuffmanTable:
             x.reverse_symbol = reverse_bits(symbol, bits)
             # print printbits(x.symbol, bits), printbits(x.reverse_symbol, bits)
 
-    def find_next_symbol(self, field: Bitfield, rev: bool = True) -> int:
+    def find_next_symbol(
+        self, field: Bitfield, rev: bool = True, tracer: T_TRACER = log_tracer
+    ) -> int:
         cached_length = -1
         cached = None
         for x in self.table:
@@ -103,7 +128,9 @@ class HuffmanTable:
                 cached_length = x.bits
             if x.reverse_symbol == cached:
                 field.readbits(x.bits)
-                log(
+                tracer(
+                    field,
+                    "symbol",
                     "found symbol",
                     hex(cached) if cached is not None else cached,
                     "of len",
@@ -116,7 +143,156 @@ class HuffmanTable:
             "unfound symbol, even after end of table @ " + repr(field.tell())
         )
 
+    def primary_width(self, expected_symbols: T.Optional[int] = None) -> int:
+        """Choose the width of the primary lookup table of a specialized
+        decoder: the narrowest that decodes PRIMARY_COVERAGE of the symbols
+        in one lookup, a code of n bits occurring with probability 2 ** -n.
+        If the number of symbols to decode is expected to be small, the
+        table is narrowed further, as filling it would cost more than it
+        saves. An empty table, such as the distance codes of a block of
+        literals only, has a width of 0."""
+        if not self.table:
+            return 0
+        counts = [0] * 16
+        for x in self.table:
+            counts[x.bits] += 1
+        shortest = min(x.bits for x in self.table)
+        width = longest = max(x.bits for x in self.table)
+        coverage = 0.0
+        for bits in range(shortest, longest + 1):
+            coverage += counts[bits] / (1 << bits)
+            if coverage >= PRIMARY_COVERAGE:
+                width = bits
+                break
+        width = min(width, MAX_PRIMARY_WIDTH)
+        if expected_symbols is not None:
+            while width > shortest and 1 << width > 2 * expected_symbols:
+                width -= 1
+        return width
+
+    def primary_table(self, width: int) -> T.List[int]:
+        """Return the lookup table of the codes up to width bits, indexed by
+        the next width bits of input. An entry is (symbol << 4) | length,
+        or 0 for longer codes."""
+        table = [0] * (1 << width)
+        for x in self.table:
+            if x.bits <= width:
+                assert x.reverse_symbol is not None
+                entry = (x.code << 4) | x.bits
+                table[x.reverse_symbol :: 1 << x.bits] = [entry] * (
+                    1 << (width - x.bits)
+                )
+        return table
+
+    def tiny_decoder(self) -> T.Callable[..., int]:
+        """Return a decode function equivalent to find_next_symbol() using a
+        single lookup table as wide as the longest code, for small alphabets
+        such as the 19 code length codes, whose table has at most 128
+        entries and is cheaper to fill than to generate code for."""
+        width = max((x.bits for x in self.table), default=0)
+        table = self.primary_table(width)
+        find_next_symbol = self.find_next_symbol
+
+        def decode(field: Bitfield, tracer: T_TRACER = log_tracer) -> int:
+            try:
+                v = field.snoopbits(width)
+            except LengthError:  # near the end, the code may be shorter
+                return find_next_symbol(field, tracer=tracer)
+            entry = table[v]
+            if not entry:
+                raise Exception(
+                    "unfound symbol, even after end of table @ " + repr(field.tell())
+                )
+            n = entry & 15
+            field.readbits(n)
+            tracer(
+                field,
+                "symbol",
+                "found symbol",
+                hex(v & ((1 << n) - 1)),
+                "of len",
+                n,
+                "mapping to",
+                hex(entry >> 4),
+            )
+            return entry >> 4
+
+        decode.width = width  # type: ignore
+        return decode
+
+    def specialize(
+        self, traced: bool = False, expected_symbols: T.Optional[int] = None
+    ) -> T.Callable[..., int]:
+        """Return a decode function equivalent to find_next_symbol(), with
+        a primary lookup table of primary_width() bits and the longer codes
+        of every length in dictionaries, all baked in. If traced, it emits
+        the same "symbol" events. The width is kept as its width
+        attribute."""
+        width = self.primary_width(expected_symbols)
+        key = (tuple((x.code, x.bits) for x in self.table), traced, width)
+        with _specialized_lock:
+            decode = _specialized.get(key)
+        if decode is not None:
+            return decode
+        by_length: T.Dict[int, T.Dict[int, int]] = {}
+        for x in self.table:
+            assert x.reverse_symbol is not None
+            if x.bits > width:
+                by_length.setdefault(x.bits, {})[x.reverse_symbol] = x.code
+        namespace: T.Dict[str, T.Any] = {
+            "primary": self.primary_table(width),
+            "LengthError": LengthError,
+            "find_next_symbol": self.find_next_symbol,
+        }
+        lines = ["def decode(field, tracer=None):"]
+        if width:  # else the table is empty, and decode() only raises below
+            lines += [
+                "    try:",
+                f"        v = field.snoopbits({width})",
+                "    except LengthError:  # near the end, the code may be shorter",
+                "        return find_next_symbol(field, tracer=tracer)",
+                "    entry = primary[v]",
+                "    if entry:",
+                "        n = entry & 15",
+                "        field.readbits(n)",
+            ]
+            if traced:
+                lines.append(
+                    '        tracer(field, "symbol", "found symbol", '
+                    'hex(v & ((1 << n) - 1)), "of len", n, "mapping to", '
+                    "hex(entry >> 4))"
+                )
+            lines += ["        return entry >> 4", "    snoop = field.snoopbits"]
+        for bits, codes in sorted(by_length.items()):
+            namespace[f"codes{bits}"] = codes
+            lines += [
+                f"    v = snoop({bits})",
+                f"    c = codes{bits}.get(v)",
+                "    if c is not None:",
+                f"        field.readbits({bits})",
+            ]
+            if traced:
+                lines.append(
+                    '        tracer(field, "symbol", "found symbol", hex(v), '
+                    f'"of len", {bits}, "mapping to", hex(c))'
+                )
+            lines.append("        return c")
+        lines.append(
+            '    raise Exception("unfound symbol, even after end of table @ "'
+            " + repr(field.tell()))"
+        )
+        exec(compile("\n".join(lines), "<huffman decoder>", "exec"), namespace)
+        decode = namespace["decode"]
+        decode.width = width
+        with _specialized_lock:
+            if len(_specialized) >= _SPECIALIZED_MAX:
+                _specialized.clear()
+            _specialized[key] = decode
+        return decode
+
     def __repr__(self) -> str:
+        from pprint import pformat
+
         return f'HuffmanTable(self.table=\n{pformat(self.table)}'
 
 class OrderedHuffmanTable(HuffmanTable):
@@ -124,5 +300,5 @@ class OrderedHuffmanTable(HuffmanTable):
         l = len(lengths)
         # z = list(map(None, list(range(l)), lengths)) + [(l, -1)]
         z = list(zip(list(range(l)), lengths)) + [(l, -1)]
-        log("lengths to spans:", z)
+        self.lengths = lengths
         HuffmanTable.__init__(self, z)
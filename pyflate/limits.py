@@ -0,0 +1,115 @@
+"""
+Resource limits for decoding untrusted input. The decoder keeps running
+totals in a DecodeStats object and compares them with the Limits only when
+it flushes a chunk of output or starts a new block, so enforcing them costs
+next to nothing per symbol. Since every literal/length symbol produces at
+least one byte, no limit can be overshot by more than a chunk.
+"""
+
+from __future__ import annotations
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+    from pyflate.bit import Bitfield
+
+
+class DecodeStats:
+    """Running totals of a decode, over all gzip members."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.output = 0  # bytes of decompressed output
+        # bytes of input before the bitfield being decoded, when decoding
+        # resumed from a checkpoint, see Decoder.resume()
+        self.input_offset = 0
+        self.blocks = 0  # DEFLATE blocks started
+        self.symbols = 0  # literal/length symbols decoded
+        # Huffman table decoders built, by kind of table and width of their
+        # primary lookup table
+        self.table_widths: T.Dict[T.Tuple[str, int], int] = {}
+        # literal/length symbols decoded, by width of the primary lookup
+        # table; 0 stands for the generic scan of the table
+        self.symbols_by_width: T.Dict[int, int] = {}
+
+    def count_table(self, kind: str, width: int) -> None:
+        key = (kind, width)
+        self.table_widths[key] = self.table_widths.get(key, 0) + 1
+
+    def count_symbols(self, width: int, symbols: int) -> None:
+        self.symbols_by_width[width] = self.symbols_by_width.get(width, 0) + symbols
+
+
+class LimitExceeded(Exception):
+    """Raised when decoding exceeds one of the configured Limits."""
+
+    def __init__(
+        self,
+        limit: str,
+        value: float,
+        maximum: float,
+        position: T.Tuple[int, int],
+        output: int,
+    ) -> None:
+        super().__init__(
+            f"{limit} limit exceeded: {value} > {maximum} @{position!r} "
+            f"after {output} bytes of output"
+        )
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.position = position
+        self.output = output
+
+
+class Limits:
+    """Decoding limits. Zero means unlimited."""
+
+    def __init__(
+        self,
+        max_output: int = 0,
+        max_ratio: float = 0,
+        max_blocks: int = 0,
+        max_symbols: int = 0,
+    ) -> None:
+        self.max_output = max_output  # bytes of decompressed output
+        self.max_ratio = max_ratio  # output bytes per compressed byte consumed
+        self.max_blocks = max_blocks  # DEFLATE blocks, over all members
+        self.max_symbols = max_symbols  # literal/length symbols, all members
+
+    def check(self, b: Bitfield, stats: DecodeStats) -> None:
+        """Raise LimitExceeded if stats exceed any of the limits."""
+        if self.max_output and stats.output > self.max_output:
+            self._exceeded(b, stats, "output", stats.output, self.max_output)
+        if self.max_blocks and stats.blocks > self.max_blocks:
+            self._exceeded(b, stats, "blocks", stats.blocks, self.max_blocks)
+        if self.max_symbols and stats.symbols > self.max_symbols:
+            self._exceeded(
+                b, stats, "symbols", stats.symbols, self.max_symbols
+            )
+        if self.max_ratio:
+            consumed = stats.input_offset + b.tell()[0]
+            ratio = stats.output / max(consumed, 1)
+            if ratio > self.max_ratio:
+                self._exceeded(b, stats, "ratio", ratio, self.max_ratio)
+
+    def check_output(self, consumed: int, output: int) -> None:
+        """Raise LimitExceeded if output bytes from consumed bytes of input
+        exceed the output or ratio limit. For results obtained without
+        decoding, such as cache hits; the block and symbol limits bound the
+        work of decoding, which such results do not take."""
+        position = (consumed, 0)
+        if self.max_output and output > self.max_output:
+            raise LimitExceeded("output", output, self.max_output, position, output)
+        if self.max_ratio:
+            ratio = output / max(consumed, 1)
+            if ratio > self.max_ratio:
+                raise LimitExceeded("ratio", ratio, self.max_ratio, position, output)
+
+    @staticmethod
+    def _exceeded(
+        b: Bitfield, stats: DecodeStats, limit: str, value: float, maximum: float
+    ) -> None:
+        raise LimitExceeded(limit, value, maximum, b.tell(), stats.output)
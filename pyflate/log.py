@@ -1,6 +1,27 @@
-import typing as T
-import logging
+from __future__ import annotations
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+
+    # A tracer receives every decoder event as tracer(bitfield, event, *args).
+    # The bitfield is passed so that tracers which care about the position
+    # can ask for it; the default one does not and just logs the arguments.
+    T_TRACER = T.Callable[..., None]
+
 
 # basically log(*args), but debug
 def log(*args: T.Any) -> None:
-    logging.debug(" ".join(map(str, args)))
+    # logging is imported on first use, so that decoding without logging
+    # does not pay for importing and configuring it
+    import logging
+
+    logging.getLogger("pyflate").debug(" ".join(map(str, args)))
+
+
+def log_tracer(b: T.Any, event: str, *args: T.Any) -> None:
+    log(*args)
+
+
+def null_tracer(b: T.Any, event: str, *args: T.Any) -> None:
+    pass
@@ -0,0 +1,199 @@
+"""
+Pipelined decoding. The decoder runs on the calling thread and hands every
+chunk of output on to two stages with a thread each: the checksum stage
+verifies the CRC32 of every gzip member and feeds any hashlib objects given,
+the writer stage passes the chunk to a sink such as os.write(). zlib.crc32(),
+hashlib and os.write() release the GIL on large buffers, so the stages
+overlap with decoding rather than taking turns with it.
+
+Chunks are copied into buffers taken from a fixed free list and go back to
+it once written, so the pipeline allocates no buffers once it is running,
+and a slow stage holds up the decoder when all the buffers are in flight.
+Every stage keeps its busy time; report() turns them into utilizations,
+which tell the stage that bounds the throughput.
+"""
+
+import os
+import queue
+import threading
+import time
+import typing as T
+import zlib
+
+from pyflate import Decoder
+from pyflate.bit import Bitfield
+from pyflate.limits import Limits
+from pyflate.log import null_tracer
+
+# buffers in flight between the decoder and the end of the pipeline
+BUFFERS = 8
+
+Footer = T.Tuple[int, int]  # CRC32 and ISIZE of a gzip member
+Item = T.Union[bytearray, Footer, None]  # None ends the stream
+
+
+def fd_sink(fd: int) -> T.Callable[[bytearray], None]:
+    """Return a sink writing every buffer to the file descriptor fd."""
+
+    def sink(buffer: bytearray) -> None:
+        with memoryview(buffer) as view:
+            while view:
+                view = view[os.write(fd, view) :]
+
+    return sink
+
+
+class Stage:
+    """Busy time of a pipeline stage, and its error if it failed."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.busy = 0.0  # seconds spent working, not waiting
+        self.items = 0  # buffers handled
+        self.error: T.Optional[BaseException] = None
+
+
+class Pipeline:
+    """Decoder whose output is checksummed and written on separate
+    threads. The sink is called with a bytearray that is reused as soon as
+    the sink returns, so it must not keep a reference to it."""
+
+    def __init__(
+        self,
+        sink: T.Callable[[bytearray], T.Any],
+        hashes: T.Sequence[T.Any] = (),
+        buffers: int = BUFFERS,
+        limits: T.Optional[Limits] = None,
+        codegen: T.Optional[bool] = None,
+    ) -> None:
+        if buffers < 1:
+            raise ValueError("a pipeline needs at least one buffer")
+        self.sink = sink
+        self.hashes = hashes
+        self.decoder = Decoder(tracer=null_tracer, limits=limits, codegen=codegen)
+        self.decoder.check_crc = False
+        self.decoder.new_buffer = self._new_buffer
+        self.free: "queue.Queue[bytearray]" = queue.Queue()
+        for _ in range(buffers):
+            self.free.put(bytearray())
+        self.buffers = buffers
+        self.decode_stage = Stage("decode")
+        self.checksum_stage = Stage("checksum")
+        self.write_stage = Stage("write")
+        self.elapsed = 0.0
+
+    def _new_buffer(self) -> bytearray:
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            buffer = self.free.get()
+            # blocked on the later stages, not decoding
+            self.decode_stage.busy -= time.perf_counter() - start
+            return buffer
+
+    def run_bitfield(self, b: Bitfield) -> int:
+        """Decode the gzip stream in b through the pipeline. Return the
+        number of bytes written."""
+        decoder = self.decoder
+        checksum_queue: "queue.Queue[Item]" = queue.Queue()
+        write_queue: "queue.Queue[T.Optional[bytearray]]" = queue.Queue()
+        threads = [
+            threading.Thread(
+                target=self._checksum, args=(checksum_queue, write_queue), daemon=True
+            ),
+            threading.Thread(target=self._write, args=(write_queue,), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        # the decoder is busy from start to end, less the time it waits for
+        # free buffers, see _new_buffer()
+        start = time.perf_counter()
+        self.decode_stage.busy -= start
+        footers = 0
+        try:
+            for chunk in decoder.chunks_bitfield(b):
+                # a footer is read after the last chunk of its member
+                while footers < len(decoder.footers):
+                    checksum_queue.put(decoder.footers[footers])
+                    footers += 1
+                checksum_queue.put(chunk)  # type: ignore
+                self.decode_stage.items += 1
+                if self.checksum_stage.error or self.write_stage.error:
+                    break
+            else:
+                for footer in decoder.footers[footers:]:
+                    checksum_queue.put(footer)
+        finally:
+            self.decode_stage.busy += time.perf_counter()
+            checksum_queue.put(None)
+            for thread in threads:
+                thread.join()
+            self.elapsed += time.perf_counter() - start
+        for stage in (self.checksum_stage, self.write_stage):
+            if stage.error is not None:
+                raise stage.error
+        return decoder.stats.output
+
+    def run(self, f: T.BinaryIO) -> int:
+        return self.run_bitfield(Bitfield(f))
+
+    def _checksum(
+        self,
+        checksum_queue: "queue.Queue[Item]",
+        write_queue: "queue.Queue[T.Optional[bytearray]]",
+    ) -> None:
+        stage = self.checksum_stage
+        crc = size = 0
+        for item in iter(checksum_queue.get, None):
+            if stage.error is not None:
+                if isinstance(item, bytearray):
+                    self.free.put(item)  # keep the decoder from blocking
+                continue
+            start = time.perf_counter()
+            try:
+                if isinstance(item, tuple):
+                    if item[0] != crc:
+                        raise Exception(
+                            "CRC check failed after " + repr(size) + " bytes of output"
+                        )
+                    crc = 0
+                else:
+                    crc = zlib.crc32(item, crc)
+                    size += len(item)
+                    for h in self.hashes:
+                        h.update(item)
+                    stage.items += 1
+                    write_queue.put(item)
+            except BaseException as e:  # re-raised on the decoding thread
+                stage.error = e
+                if isinstance(item, bytearray):
+                    self.free.put(item)
+            stage.busy += time.perf_counter() - start
+        write_queue.put(None)
+
+    def _write(self, write_queue: "queue.Queue[T.Optional[bytearray]]") -> None:
+        stage = self.write_stage
+        for buffer in iter(write_queue.get, None):
+            if stage.error is None:
+                start = time.perf_counter()
+                try:
+                    self.sink(buffer)
+                    stage.items += 1
+                except BaseException as e:  # re-raised on the decoding thread
+                    stage.error = e
+                stage.busy += time.perf_counter() - start
+            self.free.put(buffer)
+
+    def report(self) -> T.Dict[str, T.Dict[str, float]]:
+        """Return the busy time, utilization and buffers handled of every
+        stage, over the wall time the pipeline ran for."""
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            stage.name: {
+                "busy": stage.busy,
+                "utilization": stage.busy / elapsed,
+                "items": stage.items,
+            }
+            for stage in (self.decode_stage, self.checksum_stage, self.write_stage)
+        }
@@ -0,0 +1,126 @@
+"""
+Read-ahead for slow input. ReadAhead wraps a binary file object and reads
+it on a background thread into a bounded queue of blocks, so that a decoder
+reading from the wrapper (through Bitfield, like any other file) overlaps
+its work with the I/O instead of waiting for every read. Both sides keep
+timings: how long the reader thread spent in read() and how long the
+decoder was blocked waiting for input, which tells whether decoding is I/O
+or CPU bound.
+"""
+
+import queue
+import threading
+import time
+import typing as T
+
+# Blocks are read with this size by default; a depth of 2 is double and 3
+# triple buffering.
+BLOCK_SIZE = 1 << 16
+DEPTH = 2
+
+
+class ReadAhead:
+    """Read-only file object over f, read ahead on a background thread in
+    up to depth blocks of block_size bytes."""
+
+    def __init__(
+        self, f: T.BinaryIO, depth: int = DEPTH, block_size: int = BLOCK_SIZE
+    ) -> None:
+        if depth < 1 or block_size < 1:
+            raise ValueError("depth and block_size must be positive")
+        self.f = f
+        self.block_size = block_size
+        self.queue: "queue.Queue[T.Union[bytes, BaseException]]" = queue.Queue(depth)
+        self.buffer = b""
+        self.offset = 0
+        self.eof = False
+        self.blocks = 0  # blocks read by the background thread
+        self.read_time = 0.0  # seconds the background thread spent reading
+        self.wait_time = 0.0  # seconds the consumer was blocked on input
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        try:
+            while not self.stopping.is_set():
+                start = time.perf_counter()
+                block = self.f.read(self.block_size)
+                self.read_time += time.perf_counter() - start
+                self._put(block)
+                if not block:
+                    return
+                self.blocks += 1
+        except BaseException as e:  # handed over to the consumer
+            self._put(e)
+
+    def _put(self, item: T.Union[bytes, BaseException]) -> None:
+        # time out now and then, to notice close() while the queue is full
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _next_block(self) -> bool:
+        """Move on to the next block. Return False at end of file."""
+        if self.eof:
+            return False
+        try:
+            item = self.queue.get_nowait()
+        except queue.Empty:
+            start = time.perf_counter()
+            item = self.queue.get()
+            self.wait_time += time.perf_counter() - start
+        if isinstance(item, BaseException):
+            self.eof = True
+            raise item
+        if not item:
+            self.eof = True
+            return False
+        self.buffer, self.offset = item, 0
+        return True
+
+    def read(self, n: int = -1) -> bytes:
+        buffer, offset = self.buffer, self.offset
+        if 0 <= n <= len(buffer) - offset:
+            self.offset = offset + n
+            return buffer[offset : offset + n]
+        parts = [buffer[offset:]]
+        size = len(parts[0])
+        self.offset = len(buffer)
+        while (n < 0 or size < n) and self._next_block():
+            take = len(self.buffer) if n < 0 else min(n - size, len(self.buffer))
+            parts.append(self.buffer[:take])
+            self.offset = take
+            size += take
+        return b"".join(parts)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        """Stop the background thread. The wrapped file is not closed."""
+        self.stopping.set()
+        self.thread.join()
+
+    def __enter__(self) -> "ReadAhead":
+        return self
+
+    def __exit__(self, *exc: T.Any) -> None:
+        self.close()
+
+    def report(self, elapsed: float) -> T.Dict[str, float]:
+        """Split elapsed, the wall time the consumer ran for, into time
+        blocked on I/O and time spent decoding."""
+        return {
+            "elapsed": elapsed,
+            "io_blocked": self.wait_time,
+            "decoding": elapsed - self.wait_time,
+            "reading": self.read_time,
+            "blocks": self.blocks,
+        }
@@ -0,0 +1,169 @@
+"""
+File object interface to the decoder. GzipReader is an io.BufferedIOBase
+over the decompressed contents of a gzip stream, so it can be handed to
+anything that reads files, such as csv, json or tarfile. Only the chunk
+being read is held in memory, whatever the size of the stream.
+"""
+
+import io
+import os
+import typing as T
+
+from pyflate import Decoder
+from pyflate.limits import Limits
+from pyflate.log import null_tracer
+
+
+class GzipReader(io.BufferedIOBase):
+    """Read-only file object over the contents of a gzip file, given by
+    name or as a binary file object. Seeking forward decodes without
+    making chunks of the output, whose CRC is still checked; seeking
+    backward decodes again from the start, which needs a seekable file."""
+
+    def __init__(
+        self,
+        f: T.Union[str, "os.PathLike[str]", T.BinaryIO],
+        limits: T.Optional[Limits] = None,
+        codegen: T.Optional[bool] = None,
+    ) -> None:
+        super().__init__()
+        if isinstance(f, (str, os.PathLike)):
+            self.fileobj: T.BinaryIO = open(f, "rb")
+            self.owned = True
+        else:
+            self.fileobj = f
+            self.owned = False
+        self.start = self.fileobj.tell() if self.fileobj.seekable() else 0
+        self.decoder = Decoder(tracer=null_tracer, limits=limits, codegen=codegen)
+        self._rewind(first=True)
+
+    def _rewind(self, first: bool = False) -> None:
+        if not first:
+            self.fileobj.seek(self.start)
+        self.chunks = self.decoder.chunks(self.fileobj)
+        self.decoder.discard = 0
+        self.buffer = memoryview(b"")
+        self.offset = 0  # position of the next byte within buffer
+        self.pos = 0  # position of the next byte within the contents
+
+    def _fill(self) -> bool:
+        """Load the next chunk once the current one is used up. Return
+        False at the end of the stream."""
+        while self.offset >= len(self.buffer):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.buffer = memoryview(chunk)
+            self.offset = 0
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return self.fileobj.seekable()
+
+    def readinto(self, b: T.Any) -> int:
+        self._checkClosed()
+        view = memoryview(b).cast("B")
+        n = 0
+        while n < len(view) and self._fill():
+            chunk = self.buffer[self.offset : self.offset + len(view) - n]
+            view[n : n + len(chunk)] = chunk
+            self.offset += len(chunk)
+            n += len(chunk)
+        self.pos += n
+        return n
+
+    def readinto1(self, b: T.Any) -> int:
+        self._checkClosed()
+        view = memoryview(b).cast("B")
+        if not view or not self._fill():
+            return 0
+        chunk = self.buffer[self.offset : self.offset + len(view)]
+        view[: len(chunk)] = chunk
+        self.offset += len(chunk)
+        self.pos += len(chunk)
+        return len(chunk)
+
+    def read(self, size: T.Optional[int] = -1) -> bytes:
+        self._checkClosed()
+        if size is None or size < 0:
+            parts = []
+            while self._fill():
+                parts.append(self.buffer[self.offset :].tobytes())
+                self.pos += len(self.buffer) - self.offset
+                self.offset = len(self.buffer)
+            return b"".join(parts)
+        out = bytearray(size)
+        return bytes(out[: self.readinto(out)])
+
+    def read1(self, size: int = -1) -> bytes:
+        self._checkClosed()
+        if not self._fill():
+            return b""
+        end = len(self.buffer) if size < 0 else self.offset + size
+        chunk = self.buffer[self.offset : end].tobytes()
+        self.offset += len(chunk)
+        self.pos += len(chunk)
+        return chunk
+
+    def readline(self, size: T.Optional[int] = -1) -> bytes:
+        self._checkClosed()
+        if size is None:
+            size = -1
+        parts = []
+        n = 0
+        while n != size and self._fill():
+            buffer = self.buffer.obj
+            end = len(self.buffer) if size < 0 else self.offset + size - n
+            newline = buffer.find(b"\n", self.offset, end)  # type: ignore
+            if newline >= 0:
+                end = newline + 1
+            end = min(end, len(self.buffer))
+            parts.append(self.buffer[self.offset : end].tobytes())
+            n += end - self.offset
+            self.pos += end - self.offset
+            self.offset = end
+            if newline >= 0:
+                break
+        return b"".join(parts)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+        if whence == io.SEEK_CUR:
+            offset += self.pos
+        elif whence != io.SEEK_SET:
+            raise ValueError("seek from end not supported")
+        if offset < 0:
+            raise ValueError("negative seek position " + repr(offset))
+        if offset < self.pos:
+            if not self.seekable():
+                raise io.UnsupportedOperation("backward seek on unseekable file")
+            self._rewind()
+        skip = min(len(self.buffer) - self.offset, offset - self.pos)
+        self.offset += skip
+        self.pos += skip
+        if self.pos < offset:
+            # the decoder drops the output up to offset instead of making
+            # chunks of it, and _fill() loads the chunk that follows
+            self.decoder.discard = offset - self.pos
+            try:
+                self._fill()
+            finally:
+                self.pos = offset - self.decoder.discard  # short at the end
+                self.decoder.discard = 0
+        return self.pos
+
+    def tell(self) -> int:
+        self._checkClosed()
+        return self.pos
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.chunks.close()
+        self.buffer = memoryview(b"")
+        if self.owned:
+            self.fileobj.close()
+        super().close()
@@ -0,0 +1,280 @@
+"""
+LZ77 token stream export. Instead of resolving back-references while
+decoding, tokenize() yields the raw tokens of every DEFLATE block as compact
+parallel arrays: a token with length 0 is a literal whose value is the byte,
+any other token is a (length, distance) match with distance in value. The
+bit offset of every token is kept as well.
+
+A second stage rebuilds the output from the token arrays: resolve() is a
+plain Python loop, while resolve_numpy() resolves whole blocks with
+vectorized gathers, which needs NumPy. Tokenizing and resolving can
+therefore be measured separately (see bench_tokens.py).
+"""
+
+import array
+import typing as T
+import zlib
+
+from pyflate import (
+    WINDOW_SIZE,
+    distance_base,
+    extra_distance_bits,
+    extra_length_bits,
+    length_base,
+    load_huffman_tables,
+    more_members,
+    read_gzip_header,
+)
+from pyflate.bit import Bitfield
+from pyflate.log import null_tracer
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only resolve_numpy() needs it
+    np = None
+
+
+class TokenBlock:
+    """The tokens of one DEFLATE block."""
+
+    def __init__(self, offset: int, new_member: bool) -> None:
+        self.offset = offset  # bit offset of the block header
+        self.new_member = new_member  # first block of a gzip member
+        self.blocktype = -1
+        self.lengths = array.array("H")  # 0 for literals
+        self.values = array.array("H")  # literal byte or match distance
+        self.offsets = array.array("Q")  # bit offset of every token
+        self.stored = b""  # contents of a stored block
+        # footer of the member, set on its last block
+        self.crc: T.Optional[int] = None
+        self.isize: T.Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def output_size(self) -> int:
+        """Return the number of bytes the block decodes to."""
+        literals = self.lengths.count(0)
+        return sum(self.lengths) + literals + len(self.stored)
+
+    def to_numpy(self) -> T.Tuple[T.Any, T.Any, T.Any]:
+        """Return (lengths, values, offsets) as NumPy arrays sharing the
+        memory of the block."""
+        if np is None:
+            raise ImportError("TokenBlock.to_numpy() needs NumPy")
+        return (
+            np.frombuffer(self.lengths, dtype=np.uint16),
+            np.frombuffer(self.values, dtype=np.uint16),
+            np.frombuffer(self.offsets, dtype=np.uint64),
+        )
+
+
+def tokenize_bitfield(b: Bitfield) -> T.Iterator[TokenBlock]:
+    """Decode the gzip stream in b into token blocks, without producing
+    any output. Checksums are recorded, not verified."""
+    while True:
+        read_gzip_header(b, null_tracer)
+        new_member = True
+        while True:
+            block = TokenBlock(b.tellbits(), new_member)
+            new_member = False
+            lastbit = b.readbits(1)
+            block.blocktype = blocktype = b.readbits(2)
+            if blocktype == 0:
+                b.align()
+                length = b.readbits(16)
+                if length != b.readbits(16) ^ 0xFFFF:
+                    raise Exception("stored block lengths do not match each other")
+                block.stored = bytes(b.readbits(8) for i in range(length))
+            elif blocktype == 3:
+                raise Exception("illegal unused blocktype in use @" + repr(b.tell()))
+            else:
+                _tokenize_huffman_block(b, block)
+            if lastbit:
+                b.align()
+                block.crc = b.readbits(32)
+                block.isize = b.readbits(32)
+                yield block
+                break
+            yield block
+        if not more_members(b):
+            return
+
+
+def _tokenize_huffman_block(b: Bitfield, block: TokenBlock) -> None:
+    main_literals, main_distances = load_huffman_tables(
+        b, block.blocktype, null_tracer
+    )
+    lengths, values, offsets = block.lengths, block.values, block.offsets
+    while True:
+        start = b.tellbits()
+        r = main_literals.find_next_symbol(b, tracer=null_tracer)
+        if r < 256:
+            lengths.append(0)
+            values.append(r)
+        elif r == 256:
+            return
+        elif r <= 285:
+            length = length_base(r) + b.readbits(extra_length_bits(r))
+            r1 = main_distances.find_next_symbol(b, tracer=null_tracer)
+            if r1 > 29:
+                raise Exception(
+                    "illegal unused distance symbol in use @" + repr(b.tell())
+                )
+            lengths.append(length)
+            values.append(distance_base(r1) + b.readbits(extra_distance_bits(r1)))
+        else:
+            raise Exception(
+                "illegal unused literal/length symbol in use @" + repr(b.tell())
+            )
+        offsets.append(start)
+
+
+def tokenize(f: T.BinaryIO) -> T.Iterator[TokenBlock]:
+    return tokenize_bitfield(Bitfield(f))
+
+
+def _check_footer(block: TokenBlock, crc: int, size: int) -> None:
+    if block.crc is not None and block.crc != crc:
+        raise Exception("CRC check failed @" + repr(block.offset))
+    if block.isize is not None and block.isize != size & 0xFFFFFFFF:
+        raise Exception("incorrect length of data produced @" + repr(block.offset))
+
+
+def resolve(blocks: T.Iterable[TokenBlock]) -> bytes:
+    """Rebuild the output from token blocks, one token at a time."""
+    out = bytearray()
+    member_start = 0
+    for block in blocks:
+        if block.new_member:
+            member_start = len(out)
+        out += block.stored
+        for length, value in zip(block.lengths, block.values):
+            if not length:
+                out.append(value)
+                continue
+            if value > len(out) - member_start:
+                raise Exception("invalid distance too far back @" + repr(block.offset))
+            start = len(out) - value
+            if length <= value:
+                out += out[start : start + length]
+            else:
+                out += (out[start:] * (length // value + 1))[:length]
+        if block.crc is not None:
+            member = out[member_start:]
+            _check_footer(block, zlib.crc32(member), len(member))
+    return bytes(out)
+
+
+def _merge_matches(lengths: T.Any, values: T.Any) -> T.Tuple[T.Any, T.Any]:
+    """Merge adjacent matches of the same distance, which copy on from
+    where the previous one stopped; a run of zeros becomes one match."""
+    same = np.zeros(len(lengths), dtype=bool)
+    match = lengths != 0
+    same[1:] = match[1:] & match[:-1] & (values[1:] == values[:-1])
+    if not same.any():
+        return lengths, values
+    heads = np.flatnonzero(~same)
+    return np.add.reduceat(lengths, heads, dtype=lengths.dtype), values[heads]
+
+
+def _ranges(starts: T.Any, sizes: T.Any) -> T.Any:
+    """Return the concatenation of range(start, start + size) for all."""
+    offsets = np.arange(int(sizes.sum()), dtype=np.int32)
+    firsts = np.cumsum(sizes, dtype=np.int32) - sizes
+    return offsets + np.repeat(starts - firsts, sizes)
+
+
+def _resolve_block_numpy(window: T.Any, block: TokenBlock) -> T.Any:
+    """Resolve the tokens of a block following window, with gathers.
+    Return the window followed by the output of the block."""
+    lengths, values, _ = block.to_numpy()
+    lengths, values = _merge_matches(
+        lengths.astype(np.int32), values.astype(np.int32)
+    )
+    literal = lengths == 0
+    sizes = np.where(literal, np.int32(1), lengths)
+    w = len(window)
+    starts = np.cumsum(sizes, dtype=np.int32) - sizes + w
+
+    buf = np.empty(w + int(sizes.sum()), dtype=np.uint8)
+    buf[:w] = window
+    buf[starts[literal]] = values[literal]
+    dst = starts[~literal]
+    n = sizes[~literal]
+    distance = values[~literal]
+    if len(dst) and (dst - distance).min() < 0:
+        raise Exception("invalid distance too far back @" + repr(block.offset))
+
+    # A match with a distance shorter than its length is a run repeating
+    # its first distance bytes. Only those are resolved by gathers; the
+    # tail of the run is tiled from them afterwards, and reads from it are
+    # redirected to the byte it repeats.
+    span = np.minimum(distance, n)
+    run = span < n
+    origin = dst - distance
+    positions = _ranges(dst, span)
+    sources = positions - np.repeat(distance, span)
+    if run.any():
+        tail_starts = dst[run] + span[run]
+        tail_ends = dst[run] + n[run]
+        # the first tail ending after the source of every match
+        first = np.searchsorted(tail_ends, origin, "right")
+        reads = first < len(tail_starts)
+        reads[reads] = tail_starts[first[reads]] < (origin + span)[reads]
+        if reads.any():
+            redirect = np.flatnonzero(np.repeat(reads, span))
+            read = sources[redirect]
+            r = np.searchsorted(tail_starts, read, "right") - 1
+            inside = (r >= 0) & (read < tail_ends[np.maximum(r, 0)])
+            redirect, read, r = redirect[inside], read[inside], r[inside]
+            start = dst[run][r]
+            sources[redirect] = start + (read - start) % distance[run][r]
+
+    # Every byte is copied from src, itself for literals and the tails of
+    # runs. Copies of copies form chains, which pointer jumping collapses
+    # in logarithmically many rounds, over the bytes from the first to the
+    # last copied one.
+    if len(positions):
+        lo, hi = int(positions[0]), int(positions[-1]) + 1
+        src = np.arange(hi, dtype=np.int32)
+        src[positions] = sources
+        while True:
+            jumped = src.take(src[lo:])
+            if np.array_equal(jumped, src[lo:]):
+                break
+            src[lo:] = jumped
+        buf[lo:hi] = buf.take(src[lo:])
+
+    # Tile the tails of runs, doubling what is copied every time.
+    for d, k, done in zip(dst[run].tolist(), n[run].tolist(), span[run].tolist()):
+        while done < k:
+            step = min(done, k - done)
+            buf[d + done : d + done + step] = buf[d : d + step]
+            done += step
+    return buf
+
+
+def resolve_numpy(blocks: T.Iterable[TokenBlock]) -> bytes:
+    """Rebuild the output from token blocks, a block at a time, with
+    vectorized NumPy operations."""
+    if np is None:
+        raise ImportError("resolve_numpy() needs NumPy")
+    parts = []
+    window = np.zeros(0, dtype=np.uint8)
+    crc = size = 0
+    for block in blocks:
+        if block.new_member:
+            window = np.zeros(0, dtype=np.uint8)
+            crc = size = 0
+        if block.stored:
+            buf = np.concatenate([window, np.frombuffer(block.stored, np.uint8)])
+        else:
+            buf = _resolve_block_numpy(window, block)
+        chunk = buf[len(window) :].tobytes()
+        window = buf[-WINDOW_SIZE:].copy()
+        crc = zlib.crc32(chunk, crc)
+        size += len(chunk)
+        _check_footer(block, crc, size)
+        parts.append(chunk)
+    return b"".join(parts)
@@ -0,0 +1,48 @@
+"""
+Trace recording. A TraceRecorder is passed to the decoder as its tracer and
+keeps every event as a (bit offset, event type, payload) record, together
+with the Huffman tables of the last block, so that a single decode is enough
+to both produce the output and explain it bit by bit.
+"""
+
+import collections
+import typing as T
+
+from pyflate import gzip_main_bitfield
+from pyflate.bit import Bitfield
+
+
+class TraceRecord(T.NamedTuple):
+    offset: int
+    event: str
+    payload: T.Tuple[T.Any, ...]
+
+    @property
+    def message(self) -> str:
+        """The payload rendered the same way log() would render it."""
+        return " ".join(map(str, self.payload))
+
+
+class TraceRecorder:
+    """Tracer that records decoder events instead of logging them."""
+
+    def __init__(self) -> None:
+        self.records: T.List[TraceRecord] = []
+        self.tables: T.Optional[T.Tuple[T.Any, T.Any]] = None
+
+    def __call__(self, b: Bitfield, event: str, *args: T.Any) -> None:
+        self.records.append(TraceRecord(b.tellbits(), event, args))
+
+    def messages(self) -> T.Dict[int, T.List[str]]:
+        """Return the recorded messages grouped by bit offset."""
+        ret: T.Dict[int, T.List[str]] = collections.defaultdict(list)
+        for record in self.records:
+            ret[record.offset].append(record.message)
+        return ret
+
+    def decode(self, f: T.BinaryIO) -> bytes:
+        """Decode the gzip stream in f, recording its trace. The records
+        collected so far are kept even if decoding fails."""
+        out: T.List[bytes] = []
+        self.tables = gzip_main_bitfield(Bitfield(f), out.append, self)
+        return b"".join(out)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+"""
+ZIP reader. The central directory at the end of the archive lists every
+member with the offset of its local header, so any member can be read
+without scanning the archive. The archive is mapped into memory with mmap
+and the compressed data of a member, a raw DEFLATE stream, is sliced out of
+the mapping and inflated by the decoder. Extracting many members is spread
+over a process pool.
+
+Usage: python -m pyflate.zip [-l] [-j <processes>] <archive.zip> [<directory>]
+"""
+
+import argparse
+import concurrent.futures
+import io
+import mmap
+import os
+import struct
+import typing as T
+import zlib
+
+from pyflate import Decoder
+from pyflate.bit import Bitfield
+from pyflate.log import null_tracer
+
+END_OF_CENTRAL_DIRECTORY = b"PK\x05\x06"
+ZIP64_END_OF_CENTRAL_DIRECTORY = b"PK\x06\x06"
+ZIP64_LOCATOR = b"PK\x06\x07"
+CENTRAL_DIRECTORY_HEADER = b"PK\x01\x02"
+LOCAL_FILE_HEADER = b"PK\x03\x04"
+
+STORED = 0
+DEFLATED = 8
+
+# Members are handed to the workers in batches of about this many bytes of
+# compressed data, to amortize the inter-process overhead.
+BATCH_BYTES = 1 << 20
+
+
+class ZipEntry(T.NamedTuple):
+    name: str
+    method: int  # STORED or DEFLATED
+    flags: int
+    crc: int
+    compressed_size: int
+    size: int
+    header_offset: int  # offset of the local file header
+
+    @property
+    def is_dir(self) -> bool:
+        return self.name.endswith("/")
+
+
+def _zip64_extra(
+    extra: bytes, size: int, compressed_size: int, header_offset: int
+) -> T.Tuple[int, int, int]:
+    """Replace the fields saturated at 0xFFFFFFFF by their values in the
+    ZIP64 extended information extra field."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        if tag == 0x0001:
+            values = list(
+                struct.unpack_from("<%dQ" % (length // 8), extra, pos + 4)
+            )
+            if size == 0xFFFFFFFF:
+                size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = values.pop(0)
+            break
+        pos += 4 + length
+    return size, compressed_size, header_offset
+
+
+def read_central_directory(data: T.Any) -> T.List[ZipEntry]:
+    """Parse the central directory of the archive in data, a bytes-like
+    object such as an mmap."""
+    end = data.rfind(END_OF_CENTRAL_DIRECTORY, max(0, len(data) - 65557))
+    if end < 0:
+        raise Exception("not a ZIP archive: no end of central directory record")
+    count, cd_size, cd_offset = struct.unpack_from("<10xHII", data, end)
+    locator = end - 20
+    if locator >= 0 and data[locator : locator + 4] == ZIP64_LOCATOR:
+        (end64,) = struct.unpack_from("<8xQ", data, locator)
+        if data[end64 : end64 + 4] != ZIP64_END_OF_CENTRAL_DIRECTORY:
+            raise Exception("bad ZIP64 end of central directory @" + repr(end64))
+        count, cd_size, cd_offset = struct.unpack_from("<32xQQQ", data, end64)
+
+    entries = []
+    pos = cd_offset
+    for _ in range(count):
+        if data[pos : pos + 4] != CENTRAL_DIRECTORY_HEADER:
+            raise Exception("bad central directory header @" + repr(pos))
+        (
+            flags,
+            method,
+            crc,
+            compressed_size,
+            size,
+            name_length,
+            extra_length,
+            comment_length,
+            header_offset,
+        ) = struct.unpack_from("<8xHH4xIIIHHH8xI", data, pos)
+        name = bytes(data[pos + 46 : pos + 46 + name_length])
+        extra = bytes(
+            data[pos + 46 + name_length : pos + 46 + name_length + extra_length]
+        )
+        size, compressed_size, header_offset = _zip64_extra(
+            extra, size, compressed_size, header_offset
+        )
+        # bit 11: the name is UTF-8, otherwise it is code page 437
+        encoding = "utf-8" if flags & 0x800 else "cp437"
+        entries.append(
+            ZipEntry(
+                name.decode(encoding),
+                method,
+                flags,
+                crc,
+                compressed_size,
+                size,
+                header_offset,
+            )
+        )
+        pos += 46 + name_length + extra_length + comment_length
+    return entries
+
+
+def member_data(data: T.Any, entry: ZipEntry) -> bytes:
+    """Slice the compressed data of entry out of the archive in data."""
+    pos = entry.header_offset
+    if data[pos : pos + 4] != LOCAL_FILE_HEADER:
+        raise Exception("bad local file header @" + repr(pos))
+    name_length, extra_length = struct.unpack_from("<26xHH", data, pos)
+    start = pos + 30 + name_length + extra_length
+    return data[start : start + entry.compressed_size]
+
+
+def inflate(data: bytes, entry: ZipEntry) -> bytes:
+    """Decompress the compressed data of entry and check its CRC."""
+    if entry.flags & 0x1:
+        raise Exception("encrypted ZIP members are not supported: " + entry.name)
+    if entry.method == STORED:
+        out = bytes(data)
+        crc = zlib.crc32(out)
+    elif entry.method == DEFLATED:
+        decoder = Decoder(tracer=null_tracer)
+        out = b"".join(decoder.raw_chunks_bitfield(Bitfield(io.BytesIO(data))))
+        crc = decoder.crc
+    else:
+        raise Exception(
+            "unsupported compression method %d: %s" % (entry.method, entry.name)
+        )
+    if crc != entry.crc:
+        raise Exception("CRC check failed: " + entry.name)
+    if len(out) != entry.size:
+        raise Exception("incorrect length of data produced: " + entry.name)
+    return out
+
+
+def safe_path(directory: str, name: str) -> str:
+    """Return where to extract the member called name under directory,
+    refusing names that would escape it."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if name.startswith("/") or ".." in parts or (parts and ":" in parts[0]):
+        raise Exception("unsafe member name: " + repr(name))
+    return os.path.join(directory, *parts)
+
+
+class ZipReader:
+    """Random access to the members of a ZIP archive."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.entries = read_central_directory(self.data)
+        self.by_name = {entry.name: entry for entry in self.entries}
+
+    def namelist(self) -> T.List[str]:
+        return [entry.name for entry in self.entries]
+
+    def read(self, name: str) -> bytes:
+        entry = self.by_name[name]
+        return inflate(member_data(self.data, entry), entry)
+
+    def extract_all(self, directory: str, processes: T.Optional[int] = None) -> None:
+        """Extract every member under directory, across a process pool."""
+        for entry in self.entries:
+            path = safe_path(directory, entry.name)
+            parent = path if entry.is_dir else os.path.dirname(path)
+            os.makedirs(parent, exist_ok=True)
+        batches = []
+        batch: T.List[ZipEntry] = []
+        batch_bytes = 0
+        for entry in self.entries:
+            if entry.is_dir:
+                continue
+            batch.append(entry)
+            batch_bytes += entry.compressed_size
+            if batch_bytes >= BATCH_BYTES:
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+        if batch:
+            batches.append(batch)
+        processes = processes or os.cpu_count() or 1
+        if processes == 1 or len(batches) == 1:
+            for batch in batches:
+                _extract_members(self.path, batch, directory)
+            return
+        with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+            futures = [
+                pool.submit(_extract_members, self.path, batch, directory)
+                for batch in batches
+            ]
+            for future in futures:
+                future.result()
+
+    def close(self) -> None:
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> "ZipReader":
+        return self
+
+    def __exit__(self, *exc: T.Any) -> None:
+        self.close()
+
+
+def _extract_members(path: str, batch: T.List[ZipEntry], directory: str) -> None:
+    # runs in a worker: map the archive again rather than pickling its data
+    with open(path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        for entry in batch:
+            out = inflate(member_data(data, entry), entry)
+            with open(safe_path(directory, entry.name), "wb") as o:
+                o.write(out)
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="List or extract a ZIP archive.")
+    parser.add_argument("archive")
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("-l", "--list", action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    args = parser.parse_args()
+    with ZipReader(args.archive) as z:
+        if args.list:
+            for entry in z.entries:
+                print(f"{entry.size:12d} {entry.compressed_size:12d}  {entry.name}")
+        else:
+            z.extract_all(args.directory, args.jobs)
+
+
+if __name__ == "__main__":
+    _main()
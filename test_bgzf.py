@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from pyflate import read_gzip_header
+from pyflate.bit import Bitfield
+from pyflate.bgzf import (
+    BgzfReader,
+    decompress_parallel,
+    make_virtual_offset,
+    members,
+)
+from pyflate.encoder import BgzfWriter
+
+
+class BgzfTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(0)
+        cls.data = bytes(rng.choices(b"ACGT\n", k=200000))
+        f = io.BytesIO()
+        with BgzfWriter(f) as w:
+            w.write(cls.data)
+        cls.compressed = f.getvalue()
+        cls.index = w.index
+
+    def test_header_subfields(self):
+        extra = read_gzip_header(Bitfield(io.BytesIO(self.compressed)))
+        self.assertEqual(len(extra[b"BC"]), 2)
+
+    def test_members(self):
+        found = list(members(io.BytesIO(self.compressed)))
+        # the data members plus the EOF marker
+        self.assertEqual([m.offset for m in found[:-1]], [c for c, _ in self.index])
+        self.assertEqual(sum(m.size for m in found), len(self.compressed))
+
+    def test_decompress_parallel(self):
+        with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as f:
+            f.write(self.compressed)
+        try:
+            out = b"".join(decompress_parallel(f.name, processes=2))
+        finally:
+            os.unlink(f.name)
+        self.assertEqual(out, self.data)
+
+    def test_random_access(self):
+        reader = BgzfReader(io.BytesIO(self.compressed))
+        coffset, uoffset = self.index[2]
+        reader.seek_virtual(make_virtual_offset(coffset, 100))
+        self.assertEqual(reader.read(10), self.data[uoffset + 100 : uoffset + 110])
+        # reads continue into the following members
+        coffset, uoffset = self.index[1]
+        reader.seek_virtual(make_virtual_offset(coffset, 5))
+        self.assertEqual(reader.read(), self.data[uoffset + 5 :])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import unittest
+import io
+
+from pyflate.bit import Bitfield, LengthError
+
+
+class TestBitfield(unittest.TestCase):
+    """
+    Test cases for the Bitfield class.
+    """
+
+    def test_bitfieldu_read(self) -> None:
+        """
+        Test reading bits from a Bitfield object.
+
+        The test case reads the bits from a Bitfield object and checks
+        if the bits are read correctly. We also check if the current
+        position is updated correctly. The test case also checks if the
+        LengthError exception is raised when the end of the stream is
+        reached.
+        """
+        b = Bitfield(io.BytesIO(b"\x01"))
+        self.assertEqual(b.readbits(1), 1)
+        self.assertEqual(b.tell(), (0, 1))
+        # surprisingly, no exception is raised yet
+        self.assertEqual(b.readbits(1), 0)
+        self.assertEqual(b.tell(), (0, 2))
+        try:
+            b.readbits(8)
+            self.fail("expected exception")  # pragma: no cover
+        except LengthError:
+            pass
+
+    def test_snoop(self) -> None:
+        """
+        Test snooping bits from a Bitfield object.
+        """
+        digit = 0b0110
+        b = Bitfield(io.BytesIO(bytes([digit, digit])))
+        self.assertEqual(b.snoopbits(2), 0b10)
+        # once again, no _needbits now
+        self.assertEqual(b.snoopbits(2), 0b10)
+        self.assertEqual(b.readbits(2), 0b10)
+        # trigger the needbit
+        self.assertEqual(b.snoopbits(8), 0b10000001)
+        self.assertEqual(b.readbits(8), 0b10000001)
+
+    def test_to_skip(self) -> None:
+        """
+        Test the toskip() method of the Bitfield object.
+        """
+        b = Bitfield(io.BytesIO(bytes([0b10101, 0b1])))
+        self.assertEqual(b.bitfield, 0)
+        self.assertEqual(b.toskip(), 0)
+        b.readbits(1)
+        self.assertEqual(b.toskip(), 0b111)
+
+    def test_align(self) -> None:
+        """
+        Test the align() method of the Bitfield object.
+        """
+        b = Bitfield(io.BytesIO(bytes([2, 1, 3, 7])))
+        self.assertEqual(b.tellbits(), 0)
+        b.readbits(1)
+        self.assertEqual(b.toskip(), 0b111)
+        b.align()
+        self.assertEqual(b.tellbits(), 8)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()  # pragma: no cover
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import gzip
+import tempfile
+import unittest
+
+from pyflate.cache import DecompressCache
+from pyflate.limits import LimitExceeded, Limits
+
+
+class DecompressCacheTestCase(unittest.TestCase):
+    payloads = [gzip.compress(bytes([i]) * 1000, mtime=0) for i in range(4)]
+
+    def test_hits_and_misses(self):
+        cache = DecompressCache(1 << 20)
+        for _ in range(3):
+            self.assertEqual(cache.decompress(self.payloads[0]), b"\0" * 1000)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_lru_eviction(self):
+        cache = DecompressCache(2500)
+        for payload in self.payloads[:3]:
+            cache.decompress(payload)
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+        self.assertLessEqual(stats["bytes"], 2500)
+        # the oldest entry was evicted, the newest ones are hits
+        cache.decompress(self.payloads[2])
+        self.assertEqual(cache.stats()["hits"], 1)
+        cache.decompress(self.payloads[0])
+        self.assertEqual(cache.stats()["misses"], 4)
+
+    def test_spill(self):
+        with tempfile.TemporaryDirectory() as spill_dir:
+            cache = DecompressCache(1500, spill_dir)
+            for payload in self.payloads:
+                cache.decompress(payload)
+            self.assertEqual(cache.decompress(self.payloads[0]), b"\0" * 1000)
+            stats = cache.stats()
+            self.assertEqual((stats["spill_hits"], stats["misses"]), (1, 4))
+
+    def test_limits_apply_to_hits(self):
+        bomb = gzip.compress(b"\0" * (1 << 20), mtime=0)
+        with tempfile.TemporaryDirectory() as spill_dir:
+            # results larger than the cache go to the spill directory
+            for cache in (DecompressCache(1 << 21), DecompressCache(1, spill_dir)):
+                self.assertEqual(len(cache.decompress(bomb)), 1 << 20)
+                for limits in (Limits(max_output=1 << 16), Limits(max_ratio=100)):
+                    with self.subTest(limits=vars(limits)):
+                        self.assertRaises(
+                            LimitExceeded, cache.decompress, bomb, limits
+                        )
+                stats = cache.stats()
+                self.assertEqual(stats["hits"] + stats["spill_hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+import concurrent.futures
+import gzip
+import io
+import os
+import sys
+import time
+import unittest
+
+from pyflate import Decoder
+from pyflate.bit import Bitfield
+from pyflate.log import null_tracer
+from pyflate.trace import TraceRecorder
+from testutil import words
+
+
+def free_threaded():
+    return not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+class DecoderTestCase(unittest.TestCase):
+    streams = [words(20000, seed) for seed in range(32)]
+    payloads = [gzip.compress(data, mtime=0) for data in streams]
+
+    def decode(self, i):
+        return Decoder(tracer=null_tracer).decode(io.BytesIO(self.payloads[i]))
+
+    def test_sink_and_reuse(self):
+        out = []
+        decoder = Decoder(out.append, null_tracer)
+        for i in range(2):
+            out.clear()
+            decoder.decode_bitfield(Bitfield(io.BytesIO(self.payloads[i])))
+            self.assertEqual(b"".join(out), self.streams[i])
+            self.assertEqual(decoder.stats.output, len(self.streams[i]))
+
+    def test_concurrent_decoders(self):
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(self.decode, range(len(self.payloads))))
+        self.assertEqual(results, self.streams)
+
+    def test_concurrent_tracers(self):
+        def trace(i):
+            recorder = TraceRecorder()
+            recorder.decode(io.BytesIO(self.payloads[i]))
+            return recorder.records
+
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            traces = list(pool.map(trace, [0, 1, 0, 1]))
+        self.assertEqual(traces[0], traces[2])
+        self.assertEqual(traces[1], traces[3])
+        self.assertNotEqual(traces[0], traces[1])
+
+    @unittest.skipUnless(free_threaded(), "needs a free-threaded interpreter")
+    @unittest.skipUnless((os.cpu_count() or 1) >= 4, "needs 4 cores")
+    def test_throughput_scales(self):
+        jobs = range(len(self.payloads))
+        start = time.perf_counter()
+        for i in jobs:
+            self.decode(i)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            list(pool.map(self.decode, jobs))
+        parallel = time.perf_counter() - start
+        self.assertGreater(sequential / parallel, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import random
+import struct
+import unittest
+import zlib
+
+from pyflate import gzip_main
+from pyflate.encoder import (
+    BGZF_EOF,
+    BLOCK_SIZE,
+    BgzfWriter,
+    compress,
+    deflate,
+    read_index,
+)
+from testutil import words
+
+VOCABULARY = [
+    bytes(random.Random(i).choices(b"abcdefgh", k=1 + i % 8)) for i in range(50)
+]
+
+
+def sample(n):
+    return words(n, vocabulary=VOCABULARY)
+
+
+class EncoderTestCase(unittest.TestCase):
+    def assertRoundTrip(self, data):
+        compressed = compress(data)
+        self.assertEqual(gzip.decompress(compressed), data)
+        self.assertEqual(gzip_main(io.BytesIO(compressed)), data)
+        return compressed
+
+    def test_round_trip(self):
+        rng = random.Random(1)
+        for data in [
+            b"",
+            b"a",
+            b"abcabcabcabcabc",
+            b"\0" * 100000,
+            sample(150000),
+            bytes(rng.getrandbits(8) for _ in range(BLOCK_SIZE + 10)),
+        ]:
+            with self.subTest(size=len(data)):
+                self.assertRoundTrip(data)
+
+    def test_raw_deflate(self):
+        data = sample(5000)
+        self.assertEqual(zlib.decompress(deflate(data), wbits=-15), data)
+
+    def test_members_and_index(self):
+        data = sample(3 * BLOCK_SIZE + 123)
+        f = io.BytesIO()
+        with BgzfWriter(f) as w:
+            w.write(data)
+        compressed = f.getvalue()
+        self.assertTrue(compressed.endswith(BGZF_EOF))
+        self.assertEqual(len(w.index), 4)
+
+        index_file = io.BytesIO()
+        w.write_index(index_file)
+        index_file.seek(0)
+        index = read_index(index_file)
+        self.assertEqual(index, w.index)
+
+        # every member is independent and records its size in BSIZE
+        for coffset, uoffset in index:
+            xlen, si1, si2, slen, bsize = struct.unpack_from(
+                "<HBBHH", compressed, coffset + 10
+            )
+            self.assertEqual((xlen, si1, si2, slen), (6, 66, 67, 2))
+            member = compressed[coffset : coffset + bsize + 1]
+            expected = data[uoffset : uoffset + BLOCK_SIZE]
+            self.assertEqual(gzip.decompress(member), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
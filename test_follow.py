@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import os
+import random
+import tempfile
+import unittest
+import zlib
+
+from pyflate import Decoder
+from pyflate.bit import LengthError
+from pyflate.checkpoint import Checkpoint
+from pyflate.follow import Follower
+from pyflate.log import null_tracer
+from testutil import words
+
+
+def sample():
+    vocabulary = [b"GET", b"POST", b"/index.html", b"200", b"404", b"\n"]
+    return words(30000, vocabulary=vocabulary)
+
+
+class FollowTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".gz")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def append(self, data):
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def test_follow_growing_file(self):
+        # a streaming writer that flushes now and then, then a second member
+        data = sample()
+        c = zlib.compressobj(6, zlib.DEFLATED, 31)
+        stream = b""
+        for i in range(0, len(data), 4000):
+            stream += c.compress(data[i : i + 4000]) + c.flush(zlib.Z_SYNC_FLUSH)
+        stream += c.flush() + gzip.compress(b"second member\n", mtime=0)
+        data += b"second member\n"
+
+        out = []
+        checkpoint = None
+        rng = random.Random(1)
+        written = 0
+        while written < len(stream):
+            step = rng.randrange(1, 700)
+            self.append(stream[written : written + step])
+            written += step
+            # every poll starts from a serialized checkpoint
+            follower = Follower(self.path, checkpoint)
+            out.extend(follower.poll())
+            self.assertLessEqual(follower.checkpoint.position, written * 8)
+            checkpoint = Checkpoint.from_bytes(follower.checkpoint.to_bytes())
+        self.assertEqual(b"".join(out), data)
+        self.assertEqual(checkpoint.output, len(data))
+        self.assertEqual(checkpoint.position, len(stream) * 8)
+
+    def test_checkpoint_within_huffman_block(self):
+        data = sample()
+        stream = gzip.compress(data, mtime=0)
+        decoder = Decoder(tracer=null_tracer)
+        cut = len(stream) // 2
+        chunks = decoder.chunks(io.BytesIO(stream[:cut]))
+        head = b""
+        with self.assertRaises(LengthError):
+            for chunk in chunks:
+                head += chunk
+        checkpoint = decoder.checkpoint
+        self.assertEqual(checkpoint.output, len(head))
+        self.assertTrue(checkpoint.literal_lengths)
+        resumed = Decoder(tracer=null_tracer).resume(io.BytesIO(stream), checkpoint)
+        tail = b"".join(resumed)
+        self.assertEqual(head + tail, data)
+        self.assertLess(len(checkpoint.to_bytes()), 32768)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from pyflate.grep import MAX_LINE, grep, search_chunks
+
+DATA = b"".join(
+    b"%d %s\n" % (i, b"Error: disk" if i % 37 == 0 else b"ok") for i in range(3000)
+) + b"last Error without newline"
+
+
+def reference(pattern, flags=0):
+    """Matches found by searching the whole text line by line."""
+    ret, offset = [], 0
+    for number, line in enumerate(DATA.split(b"\n"), 1):
+        m = re.search(pattern, line, flags)
+        if m:
+            ret.append((number, offset, offset + m.start(), line))
+        offset += len(line) + 1
+    return ret
+
+
+def pieces(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class GrepTestCase(unittest.TestCase):
+    def test_matches_across_chunk_boundaries(self):
+        expected = reference(b"Error: d")
+        for size in (1, 7, 100, 4096, len(DATA)):
+            with self.subTest(size=size):
+                chunks = pieces(DATA, size)
+                found = list(search_chunks(chunks, b"Error: d", fixed=True))
+                self.assertEqual([tuple(m) for m in found], expected)
+
+    def test_regex_and_ignore_case(self):
+        found = search_chunks(pieces(DATA, 500), rb"^\d*0 ok$")
+        self.assertEqual([tuple(m) for m in found], reference(rb"^\d*0 ok$"))
+        found = search_chunks(
+            pieces(DATA, 500), b"error", fixed=True, ignore_case=True
+        )
+        self.assertEqual([tuple(m) for m in found], reference(b"(?i)error"))
+
+    def test_matches_do_not_span_lines(self):
+        self.assertEqual(list(search_chunks([b"foo\nbar\n"], rb"foo\sbar")), [])
+        self.assertEqual(list(search_chunks([b"foo\nbar\n"], rb"o[^x]b")), [])
+        # the first match spans two lines, a later one lies within a line
+        [m] = search_chunks([b"x\ny x y\n"], rb"x\s+y")
+        self.assertEqual((m.line_number, m.match_offset, m.line), (2, 4, b"y x y"))
+        for pattern in (rb"\d\s+\d", rb"k[^!]\d", rb"r\W*\d"):
+            with self.subTest(pattern=pattern):
+                found = search_chunks(pieces(DATA, 500), pattern)
+                self.assertEqual([tuple(m) for m in found], reference(pattern))
+
+    def test_long_lines_are_cut(self):
+        # 16 MiB without a newline: the line is kept up to MAX_LINE bytes and
+        # the needle at its end is dropped, the offsets of later lines are not
+        data = b"needle" + bytes(16 << 20) + b"needle\nnext needle"
+        found = list(search_chunks(pieces(data, 65536), b"needle", fixed=True))
+        second = data.index(b"\n") + 1
+        self.assertEqual(
+            [(m.line_number, m.line_offset, m.match_offset) for m in found],
+            [(1, 0, 0), (2, second, second + 5)],
+        )
+        self.assertEqual(found[0].line, data[:MAX_LINE])
+        self.assertEqual(found[1].line, b"next needle")
+
+    def test_max_count_stops_decoding(self):
+        consumed = []
+
+        def chunks():
+            for chunk in pieces(DATA, 100):
+                consumed.append(chunk)
+                yield chunk
+
+        found = list(search_chunks(chunks(), b"Error", fixed=True, max_count=2))
+        self.assertEqual([m.line_number for m in found], [1, 38])
+        self.assertLess(sum(map(len, consumed)), 1000)
+
+    def test_grep_gzip(self):
+        f = io.BytesIO(gzip.compress(DATA, mtime=0))
+        found = list(grep(f, b"last"))
+        self.assertEqual([m.line for m in found], [b"last Error without newline"])
+        self.assertEqual(found[0].line_offset, DATA.rindex(b"\n") + 1)
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "log.gz")
+            with open(path, "wb") as f:
+                f.write(gzip.compress(DATA, mtime=0))
+            grep = [sys.executable, "-m", "pyflate", "grep"]
+            proc = subprocess.run(
+                grep + ["-n", "-b", "-m", "2", "Error", path], capture_output=True
+            )
+            self.assertEqual(proc.returncode, 0)
+            self.assertEqual(
+                proc.stdout, b"1:0:0 Error: disk\n38:221:37 Error: disk\n"
+            )
+            proc = subprocess.run(grep + ["nothing", path], capture_output=True)
+            self.assertEqual((proc.returncode, proc.stdout), (1, b""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import random
+import struct
+import unittest
+import zlib
+
+from pyflate import (
+    Decoder,
+    code_length_orders,
+    gzip_main,
+    gzip_main_bitfield,
+    static_huffman_tables,
+)
+from pyflate.bit import Bitfield, BitWriter
+from pyflate.encoder import canonical_codes, huffman_lengths, run_length_encode
+from pyflate.huffman import OrderedHuffmanTable
+from pyflate.log import null_tracer
+from pyflate.trace import TraceRecorder
+from testutil import skewed
+
+
+def literals_only(data):
+    """Return a gzip member of data in a single dynamic block of literals,
+    with one distance code of length 0, that is with no distance codes."""
+    freqs = [0] * 257
+    for c in data:
+        freqs[c] += 1
+    freqs[256] = 1
+    lengths = huffman_lengths(freqs, 15)
+    rle = run_length_encode(lengths + [0])
+    cl_freqs = [0] * 19
+    for sym, _, _ in rle:
+        cl_freqs[sym] += 1
+    cl_lengths = huffman_lengths(cl_freqs, 7)
+    cl_codes = canonical_codes(cl_lengths)
+    codes = canonical_codes(lengths)
+    w = BitWriter()
+    # last block, dynamic, 257 literal/length codes, 1 distance code, 19
+    # code length codes
+    for value, bits in ((1, 1), (2, 2), (0, 5), (0, 5), (15, 4)):
+        w.writebits(value, bits)
+    for i in range(19):
+        w.writebits(cl_lengths[code_length_orders(i)], 3)
+    for sym, extra, value in rle:
+        w.writebits(cl_codes[sym], cl_lengths[sym])
+        w.writebits(value, extra)
+    for c in list(data) + [256]:
+        w.writebits(codes[c], lengths[c])
+    return (
+        b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+        + w.getvalue()
+        + struct.pack("<II", zlib.crc32(data), len(data))
+    )
+
+
+class SpecializedDecoderTestCase(unittest.TestCase):
+    payload = gzip.compress(skewed(5000), mtime=0)
+
+    def test_modes_agree(self):
+        for codegen in (None, True, False):
+            with self.subTest(codegen=codegen):
+                out = gzip_main(
+                    io.BytesIO(self.payload), tracer=null_tracer, codegen=codegen
+                )
+                self.assertEqual(out, skewed(5000))
+
+    def test_traced_events_agree(self):
+        traces = []
+        for codegen in (True, False):
+            recorder = TraceRecorder()
+            gzip_main_bitfield(
+                Bitfield(io.BytesIO(self.payload)),
+                lambda chunk: None,
+                recorder,
+                codegen=codegen,
+            )
+            traces.append(recorder.records)
+        self.assertEqual(traces[0], traces[1])
+        self.assertIn("symbol", {r.event for r in traces[0]})
+
+
+class PrimaryTableTestCase(unittest.TestCase):
+    def test_primary_width(self):
+        literals, distances = static_huffman_tables()
+        # 7, 8 and 9 bit codes: only 9 bits cover 99% of the symbols
+        self.assertEqual(literals.primary_width(), 9)
+        self.assertEqual(distances.primary_width(), 5)
+        # a few expected symbols do not pay for filling 512 entries
+        self.assertEqual(literals.primary_width(expected_symbols=100), 7)
+        # long codes are rare, and left out of the primary table
+        table = OrderedHuffmanTable([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 13])
+        table.populate_huffman_symbols()
+        self.assertEqual(table.primary_width(), 7)
+
+    def test_decoders_agree_with_the_generic_scan(self):
+        table = OrderedHuffmanTable([2, 2, 3, 0, 3, 4, 4, 0, 4, 4, 0, 0])
+        table.populate_huffman_symbols()
+        data = bytes(random.Random(1).getrandbits(8) for _ in range(200))
+        for decoder in (table.tiny_decoder(), table.specialize(expected_symbols=2)):
+            generic, special = Bitfield(io.BytesIO(data)), Bitfield(io.BytesIO(data))
+            with self.subTest(width=decoder.width):
+                for _ in range(300):
+                    expected = table.find_next_symbol(generic, tracer=null_tracer)
+                    self.assertEqual(decoder(special, tracer=null_tracer), expected)
+                    self.assertEqual(special.tellbits(), generic.tellbits())
+
+    def test_empty_table(self):
+        table = OrderedHuffmanTable([0])
+        table.populate_huffman_symbols()
+        self.assertEqual(table.primary_width(), 0)
+        for decoder in (table.tiny_decoder(), table.specialize()):
+            with self.subTest(width=decoder.width):
+                field = Bitfield(io.BytesIO(b"\xff"))
+                self.assertRaisesRegex(
+                    Exception, "unfound symbol", decoder, field, tracer=null_tracer
+                )
+        data = b"literals only, no distance codes"
+        payload = literals_only(data)
+        self.assertEqual(gzip.decompress(payload), data)
+        for codegen in (None, True, False):
+            with self.subTest(codegen=codegen):
+                out = gzip_main(
+                    io.BytesIO(payload), tracer=null_tracer, codegen=codegen
+                )
+                self.assertEqual(out, data)
+
+    def test_widths_are_recorded(self):
+        decoder = Decoder(tracer=null_tracer)
+        decoder.decode(io.BytesIO(SpecializedDecoderTestCase.payload))
+        kinds = {kind for kind, width in decoder.stats.table_widths}
+        self.assertEqual(kinds, {"code lengths", "literals", "distances"})
+        by_width = decoder.stats.symbols_by_width
+        self.assertEqual(sum(by_width.values()), decoder.stats.symbols)
+        # a block this long is decoded with specialized tables throughout
+        self.assertNotIn(0, by_width)
+
+    def test_short_blocks_are_not_specialized(self):
+        for data in (b"short", skewed(100)):
+            with self.subTest(size=len(data)):
+                decoder = Decoder(tracer=null_tracer)
+                decoder.decode(io.BytesIO(gzip.compress(data, mtime=0)))
+                self.assertEqual(
+                    decoder.stats.symbols_by_width, {0: decoder.stats.symbols}
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
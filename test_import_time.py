@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+import unittest
+
+from bench_import import (
+    BUDGET_US,
+    UNWANTED,
+    cumulative_import_time,
+    imported_modules,
+)
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_cli_imports_only_what_decoding_needs(self):
+        modules = imported_modules("pyflate.__main__")
+        for name in UNWANTED:
+            self.assertNotIn(name, modules)
+
+    def test_cli_import_time_budget(self):
+        self.assertLessEqual(cumulative_import_time("pyflate.__main__"), BUDGET_US)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import unittest
+
+from pyflate import Decoder, gzip_main
+from pyflate.bit import LengthError
+from pyflate.limits import Limits, LimitExceeded
+from pyflate.log import null_tracer
+
+
+class LimitsTestCase(unittest.TestCase):
+    bomb = gzip.compress(b"\0" * (4 << 20))
+
+    def assertLimit(self, data, limits, limit):
+        with self.assertRaises(LimitExceeded) as cm:
+            gzip_main(io.BytesIO(data), limits)
+        self.assertEqual(cm.exception.limit, limit)
+        self.assertLess(cm.exception.position[0], len(data))
+        return cm.exception
+
+    def test_max_output(self):
+        e = self.assertLimit(self.bomb, Limits(max_output=1 << 20), "output")
+        # checked at chunk granularity, so it overshoots by at most a chunk
+        self.assertLess(e.output, (1 << 20) + (1 << 17))
+
+    def test_max_ratio(self):
+        self.assertLimit(self.bomb, Limits(max_ratio=100), "ratio")
+
+    def test_max_ratio_after_resume(self):
+        # the input before the checkpoint counts towards the ratio
+        ratio = (4 << 20) / len(self.bomb)
+        limits = Limits(max_ratio=ratio * 1.5)
+        decoder = Decoder(tracer=null_tracer, limits=limits)
+        chunks = decoder.chunks(io.BytesIO(self.bomb[: len(self.bomb) // 2]))
+        head = b""
+        with self.assertRaises(LengthError):
+            for chunk in chunks:
+                head += chunk
+        checkpoint = decoder.checkpoint
+        resumed = Decoder(tracer=null_tracer, limits=limits)
+        tail = b"".join(resumed.resume(io.BytesIO(self.bomb), checkpoint))
+        self.assertEqual(head + tail, b"\0" * (4 << 20))
+
+    def test_max_symbols(self):
+        self.assertLimit(self.bomb, Limits(max_symbols=1000), "symbols")
+
+    def test_max_blocks(self):
+        # a stream of empty, non-final stored blocks
+        raw = b"\x00\x00\x00\xff\xff" * 100 + b"\x01\x00\x00\xff\xff"
+        data = gzip.compress(b"")[:10] + raw + gzip.compress(b"")[-8:]
+        self.assertEqual(gzip_main(io.BytesIO(data)), b"")
+        self.assertLimit(data, Limits(max_blocks=10), "blocks")
+
+    def test_within_limits(self):
+        data = b"hello world " * 1000
+        limits = Limits(max_output=len(data), max_ratio=1000)
+        out = gzip_main(io.BytesIO(gzip.compress(data)), limits)
+        self.assertEqual(out, data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+
+from pyflate.encoder import BgzfWriter
+from pyflate.pipeline import Pipeline, fd_sink
+
+
+class PipelineTestCase(unittest.TestCase):
+    data = b"".join(b"line %d of the pipeline test\n" % i for i in range(6000))
+    # two members, each longer than a flush
+    payload = gzip.compress(data, mtime=0) + gzip.compress(data[::-1], mtime=0)
+    expected = data + data[::-1]
+
+    def run_pipeline(self, payload, **kwargs):
+        parts = []
+        pipeline = Pipeline(lambda buffer: parts.append(bytes(buffer)), **kwargs)
+        size = pipeline.run(io.BytesIO(payload))
+        return pipeline, size, b"".join(parts)
+
+    def test_output_and_hashes(self):
+        for buffers in (1, 2, 8):
+            with self.subTest(buffers=buffers):
+                sha = hashlib.sha256()
+                pipeline, size, out = self.run_pipeline(
+                    self.payload, hashes=[sha], buffers=buffers
+                )
+                self.assertEqual(out, self.expected)
+                self.assertEqual(size, len(self.expected))
+                self.assertEqual(sha.digest(), hashlib.sha256(self.expected).digest())
+                # every buffer went back to the free list
+                self.assertEqual(pipeline.free.qsize(), buffers)
+                report = pipeline.report()
+                self.assertEqual(set(report), {"decode", "checksum", "write"})
+                self.assertGreater(report["write"]["items"], 2)
+                for stage in report.values():
+                    self.assertGreaterEqual(stage["utilization"], 0)
+
+    def test_empty_members(self):
+        # an empty member, such as the end-of-file marker of BGZF, takes no
+        # buffer, which would never come back with buffers=1
+        with io.BytesIO() as f:
+            with BgzfWriter(f, block_size=1000) as w:
+                w.write(self.data[:3000])
+            bgzf = f.getvalue()
+        empty = gzip.compress(b"", mtime=0) + gzip.compress(b"x", mtime=0)
+        for payload, expected in ((empty, b"x"), (bgzf, self.data[:3000])):
+            with self.subTest(expected=len(expected)):
+                pipeline, size, out = self.run_pipeline(payload, buffers=1)
+                self.assertEqual(out, expected)
+                self.assertEqual(size, len(expected))
+                self.assertEqual(pipeline.free.qsize(), 1)
+
+    def test_crc_mismatch(self):
+        corrupt = bytearray(self.payload)
+        corrupt[len(gzip.compress(self.data, mtime=0)) - 8] ^= 1
+        self.assertRaisesRegex(
+            Exception, "CRC check failed", self.run_pipeline, bytes(corrupt)
+        )
+
+    def test_sink_error(self):
+        def sink(buffer):
+            raise OSError("disk full")
+
+        pipeline = Pipeline(sink, buffers=2)
+        self.assertRaisesRegex(
+            OSError, "disk full", pipeline.run, io.BytesIO(self.payload)
+        )
+        self.assertEqual(pipeline.free.qsize(), 2)
+
+    def test_fd_sink(self):
+        with tempfile.TemporaryFile() as f:
+            Pipeline(fd_sink(f.fileno())).run(io.BytesIO(self.payload))
+            f.seek(0)
+            self.assertEqual(f.read(), self.expected)
+            self.assertEqual(os.fstat(f.fileno()).st_size, len(self.expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+import concurrent.futures
+import gzip
+import struct
+import sys
+import unittest
+import zlib
+
+from pyflate.pool import DecoderPool
+
+
+class DecoderPoolTestCase(unittest.TestCase):
+    streams = [b"request %d " % i * 50 for i in range(16)]
+    payloads = [gzip.compress(data, mtime=0) for data in streams]
+
+    def test_decoders_are_reused(self):
+        pool = DecoderPool()
+        for data, payload in zip(self.streams, self.payloads):
+            self.assertEqual(pool.decompress(payload), data)
+        self.assertEqual((pool.created, pool.reused), (1, 15))
+        with pool.decoder() as decoder:
+            static_tables = decoder.static_tables
+            self.assertIsNotNone(static_tables)
+            self.assertEqual(decoder.stats.output, 0)
+        with pool.decoder() as decoder, open("testdata/hello.gz", "rb") as f:
+            decoder.decode(f)
+            self.assertIs(decoder.static_tables, static_tables)
+
+    def test_threads(self):
+        pool = DecoderPool(max_idle=2)
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(pool.decompress, self.payloads * 4))
+        self.assertEqual(results, self.streams * 4)
+        self.assertLessEqual(len(pool.idle), 2)
+        self.assertEqual(pool.created + pool.reused, 64)
+
+    def test_release_after_error(self):
+        pool = DecoderPool()
+        self.assertRaises(Exception, pool.decompress, self.payloads[0][:-4])
+        self.assertEqual(pool.decompress(self.payloads[1]), self.streams[1])
+        self.assertEqual(pool.created, 1)
+
+    def test_window_is_kept(self):
+        pool = DecoderPool()
+        with pool.decoder() as decoder:
+            window, size = decoder.window, sys.getsizeof(decoder.window)
+        for data, payload in zip(self.streams, self.payloads):
+            self.assertEqual(pool.decompress(payload), data)
+        self.assertIs(decoder.window, window)
+        self.assertEqual(sys.getsizeof(window), size)
+
+    def test_previous_output_is_out_of_reach(self):
+        # matches into a preset dictionary point before the member's start
+        data = self.streams[1]
+        c = zlib.compressobj(wbits=-15, zdict=data)
+        raw = c.compress(data) + c.flush()
+        payload = (
+            b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+            + raw
+            + struct.pack("<II", zlib.crc32(data), len(data))
+        )
+        pool = DecoderPool()
+        self.assertEqual(pool.decompress(self.payloads[1]), data)
+        self.assertRaisesRegex(Exception, "too far back", pool.decompress, payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
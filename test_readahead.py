@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import random
+import unittest
+
+from pyflate import Decoder
+from pyflate.log import null_tracer
+from pyflate.readahead import ReadAhead
+
+
+class Failing(io.RawIOBase):
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        raise OSError("disk on fire")
+
+
+class ReadAheadTestCase(unittest.TestCase):
+    data = bytes(random.Random(0).getrandbits(8) for _ in range(10000))
+
+    def test_read(self):
+        with ReadAhead(io.BytesIO(self.data), depth=3, block_size=7) as f:
+            self.assertEqual(f.read(1), self.data[:1])
+            self.assertEqual(f.read(20), self.data[1:21])
+            self.assertEqual(f.read(0), b"")
+            self.assertEqual(f.read(), self.data[21:])
+            self.assertEqual(f.read(1), b"")
+            self.assertEqual(f.blocks, -(-len(self.data) // 7))
+
+    def test_decode(self):
+        payload = gzip.compress(self.data * 3, mtime=0)
+        for depth in (1, 2, 3):
+            with self.subTest(depth=depth):
+                with ReadAhead(io.BytesIO(payload), depth, 4096) as f:
+                    out = Decoder(tracer=null_tracer).decode(f)
+                self.assertEqual(out, self.data * 3)
+
+    def test_errors_reach_the_consumer(self):
+        with ReadAhead(Failing()) as f:
+            self.assertRaisesRegex(OSError, "disk on fire", f.read, 1)
+
+    def test_close_with_full_queue(self):
+        f = ReadAhead(io.BytesIO(self.data), depth=1, block_size=1)
+        f.read(1)
+        f.close()
+        self.assertFalse(f.thread.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import csv
+import gzip
+import io
+import tarfile
+import unittest
+
+import pyflate
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self, data):
+        self.f = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.f.readinto(b)
+
+
+class GzipReaderTestCase(unittest.TestCase):
+    data = b"".join(b"%d,line %d\n" % (i, i * i) for i in range(12000))
+    payload = gzip.compress(data, mtime=0)
+
+    def reader(self):
+        return pyflate.GzipReader(io.BytesIO(self.payload))
+
+    def test_read(self):
+        with self.reader() as r:
+            self.assertEqual(r.read(10), self.data[:10])
+            self.assertEqual(r.read(), self.data[10:])
+            self.assertEqual(r.read(), b"")
+
+    def test_readinto(self):
+        buf = bytearray(70000)
+        with self.reader() as r:
+            self.assertEqual(r.readinto(buf), len(buf))
+            self.assertEqual(buf, self.data[: len(buf)])
+            self.assertEqual(r.tell(), len(buf))
+
+    def test_lines(self):
+        with self.reader() as r:
+            self.assertEqual(list(r), self.data.splitlines(keepends=True))
+        with self.reader() as r:
+            rows = list(csv.reader(io.TextIOWrapper(r, encoding="ascii")))
+            self.assertEqual(rows[-1], ["11999", "line 143976001"])
+
+    def test_seek(self):
+        with self.reader() as r:
+            self.assertEqual(r.seek(100000), 100000)
+            self.assertEqual(r.read(20), self.data[100000:100020])
+            r.seek(-10, io.SEEK_CUR)
+            self.assertEqual(r.read(5), self.data[100010:100015])
+            r.seek(5)
+            self.assertEqual(r.read(5), self.data[5:10])
+            self.assertEqual(r.seek(10 ** 9), len(self.data))
+
+    def test_seek_makes_no_chunks(self):
+        buffers = []
+
+        def new_buffer():
+            buffers.append(bytearray())
+            return buffers[-1]
+
+        with self.reader() as r:
+            r.decoder.new_buffer = new_buffer
+            r.seek(len(self.data) - 10)
+            self.assertEqual(r.read(), self.data[-10:])
+        self.assertEqual([len(buffer) for buffer in buffers], [10])
+        # the skipped output is still checked against the CRC
+        corrupt = bytearray(self.payload)
+        corrupt[-8] ^= 1
+        with pyflate.GzipReader(io.BytesIO(bytes(corrupt))) as r:
+            self.assertRaisesRegex(Exception, "CRC check failed", r.seek, 10 ** 9)
+
+    def test_backward_seek_needs_seekable_file(self):
+        r = pyflate.GzipReader(Unseekable(self.payload))
+        r.seek(100)
+        self.assertRaises(io.UnsupportedOperation, r.seek, 0)
+
+    def test_tarfile(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+            for name in ("a.csv", "b.csv"):
+                info = tarfile.TarInfo(name)
+                info.size = len(self.data)
+                tar.addfile(info, io.BytesIO(self.data))
+        for mode in ("r", "r|"):
+            reader = pyflate.GzipReader(io.BytesIO(archive.getvalue()))
+            with self.subTest(mode=mode), tarfile.open(
+                fileobj=reader, mode=mode
+            ) as tar:
+                for member in tar:
+                    self.assertEqual(tar.extractfile(member).read(), self.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
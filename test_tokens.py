@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+import gzip
+import io
+import unittest
+import zlib
+
+from pyflate.tokens import np, resolve, resolve_numpy, tokenize
+from testutil import WORDS, words
+
+
+def sample(n=20000):
+    return words(n, vocabulary=WORDS + [b"aaaaaaaaaaaa"])
+
+
+class TokenizeTestCase(unittest.TestCase):
+    def payloads(self):
+        data = sample()
+        yield data, gzip.compress(data, mtime=0)
+        yield data, gzip.compress(data, compresslevel=0, mtime=0)
+        # overlapping runs: a single byte repeated is a match at distance 1
+        yield b"x" * 5000, gzip.compress(b"x" * 5000, mtime=0)
+        # matches copying from the tail of earlier runs
+        runs = b"".join(
+            b"%d" % i + bytes([65 + i % 5]) * (i * 37 % 300) for i in range(300)
+        )
+        runs += runs[5000:9000]
+        yield runs, gzip.compress(runs, mtime=0)
+        yield data + b"z" * 300, (
+            gzip.compress(data, mtime=0) + gzip.compress(b"z" * 300, mtime=0)
+        )
+
+    def test_tokens(self):
+        data = b"abcabcabcabc"
+        [block] = tokenize(io.BytesIO(gzip.compress(data, mtime=0)))
+        # a few literals, then a single overlapping match
+        *literals, length = block.lengths
+        self.assertEqual(set(literals), {0})
+        self.assertEqual(block.values[-1], 3)
+        self.assertEqual(bytes(block.values[:-1].tolist()), data[: len(literals)])
+        self.assertEqual(list(block.offsets), sorted(block.offsets))
+        self.assertEqual(block.output_size(), len(data))
+        self.assertEqual(block.crc, zlib.crc32(data))
+        self.assertEqual(block.isize, len(data))
+
+    def test_resolve(self):
+        for data, payload in self.payloads():
+            with self.subTest(size=len(payload)):
+                blocks = list(tokenize(io.BytesIO(payload)))
+                self.assertEqual(resolve(blocks), data)
+
+    def test_resolve_checks_crc(self):
+        payload = bytearray(gzip.compress(sample(), mtime=0))
+        payload[-8] ^= 1
+        blocks = list(tokenize(io.BytesIO(bytes(payload))))
+        self.assertRaisesRegex(Exception, "CRC check failed", resolve, blocks)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_resolve_numpy(self):
+        for data, payload in self.payloads():
+            with self.subTest(size=len(payload)):
+                blocks = list(tokenize(io.BytesIO(payload)))
+                self.assertEqual(resolve_numpy(blocks), data)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_to_numpy(self):
+        [block] = tokenize(io.BytesIO(gzip.compress(sample(2000), mtime=0)))
+        lengths, values, offsets = block.to_numpy()
+        self.assertEqual(len(lengths), len(block))
+        self.assertEqual(int((lengths == 0).sum()), block.lengths.count(0))
+        self.assertTrue((offsets[1:] > offsets[:-1]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
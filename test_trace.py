@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+
+import unittest
+
+from pyflate.trace import TraceRecorder
+
+
+class TraceRecorderTestCase(unittest.TestCase):
+    def test_single_pass_records_events_and_tables(self):
+        recorder = TraceRecorder()
+        with open("testdata/hello.gz", "rb") as f:
+            self.assertEqual(recorder.decode(f), b"hello")
+        offsets = [r.offset for r in recorder.records]
+        self.assertEqual(offsets, sorted(offsets))
+        literals = [r for r in recorder.records if r.event == "literal"]
+        self.assertEqual(len(literals), 5)
+        self.assertEqual(
+            literals[0].message, "found literal b'h'. r=104, hex(r)='0x68'"
+        )
+        self.assertEqual(len(recorder.tables), 2)
+        self.assertIn(literals[0].offset, recorder.messages())
+
+
+if __name__ == "__main__":
+    unittest.main()
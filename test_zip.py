@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+import os
+import random
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import pyflate.zip
+from pyflate.zip import ZipReader, read_central_directory, safe_path
+from testutil import words
+
+
+def members(count=40):
+    rng = random.Random(0)
+    vocabulary = [b"def", b"class", b"return", b"import", b"self", b"\n"]
+    ret = {}
+    for i in range(count):
+        size = rng.randrange(0, 3000)
+        ret[f"src/pkg{i % 4}/module{i}.py"] = words(size, i, vocabulary)
+    return ret
+
+
+class ZipReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.path = os.path.join(self.tmp, "archive.zip")
+        self.members = members()
+        with zipfile.ZipFile(self.path, "w") as z:
+            z.writestr("src/", b"")
+            for i, (name, data) in enumerate(self.members.items()):
+                method = zipfile.ZIP_STORED if i % 5 == 0 else zipfile.ZIP_DEFLATED
+                z.writestr(name, data, compress_type=method)
+
+    def test_random_access(self):
+        with ZipReader(self.path) as z:
+            self.assertEqual(z.namelist(), ["src/", *self.members])
+            for name in ["src/pkg3/module39.py", "src/pkg0/module0.py"]:
+                self.assertEqual(z.read(name), self.members[name])
+
+    def test_extract_all(self):
+        for processes in (1, 2):
+            with self.subTest(processes=processes):
+                out = os.path.join(self.tmp, f"out{processes}")
+                # small batches, so that the members are spread over workers
+                with ZipReader(self.path) as z, mock.patch.object(
+                    pyflate.zip, "BATCH_BYTES", 4096
+                ):
+                    z.extract_all(out, processes)
+                for name, data in self.members.items():
+                    with open(os.path.join(out, name), "rb") as f:
+                        self.assertEqual(f.read(), data)
+
+    def test_crc_mismatch(self):
+        with open(self.path, "rb") as f:
+            data = bytearray(f.read())
+        # corrupt the CRC of the third member in the central directory
+        entry = read_central_directory(data)[2]
+        pos = data.index(b"PK\x01\x02")
+        for _ in range(2):
+            pos = data.index(b"PK\x01\x02", pos + 1)
+        data[pos + 16] ^= 0xFF
+        with open(self.path, "wb") as f:
+            f.write(data)
+        with ZipReader(self.path) as z:
+            self.assertRaisesRegex(Exception, "CRC check failed", z.read, entry.name)
+
+    def test_unsafe_names(self):
+        for name in ["../evil", "/etc/passwd", "a/../../b", "C:/x"]:
+            self.assertRaises(Exception, safe_path, self.tmp, name)
+        self.assertEqual(safe_path("d", "a/./b"), os.path.join("d", "a", "b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
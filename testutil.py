@@ -0,0 +1,24 @@
+"""
+Test data shared by the test modules.
+"""
+
+import random
+
+WORDS = [b"alpha", b"beta", b"gamma", b"delta", b"\n"]
+
+
+def words(n, seed=0, vocabulary=WORDS):
+    """Return n bytes of words picked at random from vocabulary, separated
+    by spaces."""
+    rng = random.Random(seed)
+    out = bytearray()
+    while len(out) < n:
+        out += rng.choice(vocabulary) + b" "
+    return bytes(out[:n])
+
+
+def skewed(n, seed=0):
+    """Return n random bytes, small values far more likely than large
+    ones, for Huffman codes of many different lengths."""
+    rng = random.Random(seed)
+    return bytes(min(int(rng.expovariate(0.05)), 255) for _ in range(n))